@@ -0,0 +1,68 @@
+import pygame
+import threading
+import time
+from Image_manager import surface_cache
+from Sound_manager import sound_bank
+
+
+class AssetLoader:
+    """Loads the gameplay assets listed in its manifest on a background thread, so the menu can be shown
+    before they are ready, and reports how long startup took"""
+
+    # every image and sound file used during play, the menu and intro load theirs on first use
+    IMAGES = ['pacman-horiz.png', 'pacman-vert.png', 'pacman_death.png',
+              'ghost-red.png', 'ghost-pink.png', 'ghost-lblue.png', 'ghost-orange.png',
+              'ghost-ppellet.png', 'ghost-ppellet-warn.png', 'ghost-eyes.png',
+              'blue-portal-bg.png', 'orange-portal-bg.png',
+              'apple.png', 'cherry.png', 'peach.png', 'strawberry.png']
+    SOUNDS = ['pacman_chomp.wav', 'pacman_eatfruit.wav', 'pacman_death.wav', 'pacman-portal.wav',
+              'ghost-blue.wav', 'pacman_eatghost.wav', 'ghost-std.wav',
+              'portal-open.wav', 'portal-travel.wav', 'pacman_beginning.wav']
+
+    def __init__(self):
+        self.start_time = time.perf_counter()   # startup begins when the loader is created
+        self.first_frame_time = None
+        self.ready_time = None
+        self.ready = threading.Event()  # barrier which is set once every asset in the manifest is loaded
+        self.thread = None
+
+    def start(self):
+        """Begin loading the manifest on a background thread"""
+        self.thread = threading.Thread(target=self.load_all, name='asset-loader', daemon=True)
+        self.thread.start()
+
+    def load_all(self):
+        """Decode every image and sound in the manifest into the shared caches"""
+        try:
+            for img in AssetLoader.IMAGES:
+                surface_cache.load_file(img)
+            if pygame.mixer.get_init():
+                for s_file in AssetLoader.SOUNDS:
+                    sound_bank.load(s_file)
+        except (pygame.error, OSError) as e:
+            print(e)    # anything missed is loaded again on first use, where errors are raised
+        finally:
+            self.ready_time = time.perf_counter()
+            self.ready.set()
+
+    def is_ready(self):
+        """Return True if the background loading has finished, or was never started"""
+        return self.thread is None or self.ready.is_set()
+
+    def wait(self):
+        """Block until the background loading has finished, returning the milliseconds spent waiting"""
+        if self.thread is None:
+            return 0
+        wait_start = time.perf_counter()
+        self.ready.wait()
+        return (time.perf_counter() - wait_start) * 1000
+
+    def mark_first_frame(self):
+        """Record the first frame being shown, and report the time it took to get there"""
+        if self.first_frame_time is None:
+            self.first_frame_time = time.perf_counter()
+            print('Time to first frame: %d ms' % self.elapsed_ms(self.first_frame_time))
+
+    def elapsed_ms(self, timestamp):
+        """Return the milliseconds from startup to the given time"""
+        return (timestamp - self.start_time) * 1000
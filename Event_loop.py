@@ -1,22 +1,75 @@
 import pygame
+from collections import deque
+from inspect import signature, Parameter
 from sys import exit
 
 
 class EventLoop:
     """Contains the logic for checking events in a game loop"""
-    def __init__(self, loop_running=False, actions=None):
-        self.action_map = {pygame.QUIT: exit, }
+    active = None   # loop whose event types the pygame event queue is currently filtered to
+
+    def __init__(self, loop_running=False, actions=None, event_budget=64, recorder=None):
+        self.handlers = {}  # event type -> (action, whether the action takes the event)
+        self.register(pygame.QUIT, exit)
         if isinstance(actions, dict):
-            self.action_map.update(actions)     # add custom actions, if provided
+            for event_type, action in actions.items():  # add custom actions, if provided
+                self.register(event_type, action)
         self.loop_running = loop_running
+        self.event_budget = event_budget    # most events handled per check, the rest wait for the next check
+        self.backlog = deque(maxlen=event_budget * 4)   # events waiting to be handled, oldest dropped first
+        self.handled = 0
+        self.unhandled = 0  # events with no action, which slipped past the queue filter
+        self.deferred = 0   # events left over a budget, handled by a later check
+        self.dropped = 0    # events lost because the backlog was full
+        self.recorder = recorder    # optional replay recorder, shown every event dispatched
+
+    def register(self, event_type, action):
+        """Map an event type to an action, working out once whether the action should be passed the event"""
+        try:
+            takes_event = any(p.kind == Parameter.VAR_POSITIONAL or
+                              (p.kind in (Parameter.POSITIONAL_ONLY, Parameter.POSITIONAL_OR_KEYWORD) and
+                               p.default is Parameter.empty) for p in signature(action).parameters.values())
+        except (TypeError, ValueError):     # no signature available, e.g. some builtins
+            takes_event = False
+        self.handlers[event_type] = (action, takes_event)
+        if EventLoop.active is self:
+            self.filter_events()
+
+    def filter_events(self):
+        """Only let the event types this loop handles into the pygame event queue"""
+        pygame.event.set_blocked(None)
+        pygame.event.set_allowed(list(self.handlers))
+        EventLoop.active = self
+
+    def dispatch(self, event):
+        """Run the action mapped to an event"""
+        handler = self.handlers.get(event.type)
+        if handler is None:
+            self.unhandled += 1
+            return
+        action, takes_event = handler
+        if self.recorder is not None:
+            self.recorder.record(event)
+        if takes_event:
+            action(event)   # execute events from map
+        else:
+            action()
+        self.handled += 1
 
     def check_events(self):
-        """Check events to see if any match mapped actions"""
+        """Handle a batch of queued events, up to the event budget, quitting straight away if asked to"""
+        if EventLoop.active is not self:
+            self.filter_events()
+        queued = 0
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
-                self.action_map[event.type]()   # quit game with no argument passed
-            elif event.type in self.action_map:
-                try:
-                    self.action_map[event.type](event)    # execute events from map
-                except TypeError:
-                    self.action_map[event.type]()   # event function may not accept any parameters
\ No newline at end of file
+                self.dispatch(event)    # never held back or dropped
+            else:
+                if len(self.backlog) == self.backlog.maxlen:
+                    self.dropped += 1
+                self.backlog.append(event)
+                queued += 1
+        for _ in range(min(self.event_budget, len(self.backlog))):
+            self.dispatch(self.backlog.popleft())
+        # the backlog is handled oldest first, so any events left over from this batch are its newest
+        self.deferred += min(queued, len(self.backlog))
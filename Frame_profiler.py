@@ -0,0 +1,136 @@
+import csv
+import os
+import pygame
+import time
+from collections import deque
+from Text_cache import text_cache
+
+
+class StageTimer:
+    """Times one stage of a frame, adding the time spent in it to the profiler's current frame"""
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        frame = self.profiler.current
+        if frame is not None:
+            frame[self.name] += (time.perf_counter() - self.start) * 1000
+
+
+class NullStage:
+    """Stands in for a stage timer while profiling is switched off"""
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+class FrameProfiler:
+    """Times each stage of a game frame, showing rolling averages, 99th percentiles and the worst frame
+    in an overlay, and keeping every frame of the session for export to CSV"""
+
+    STAGES = ('check_player', 'ghosts.update', 'player.update', 'teleport',
+              'maze.blit', 'ghosts.blit', 'player.blit', 'hud.blit', 'display.flip')
+    NULL_STAGE = NullStage()
+    TEXT_COLOR = (0, 255, 0)
+    BACKGROUND = (0, 0, 0, 180)
+
+    def __init__(self, screen, window=300, refresh_ms=500, export_dir='profiles'):
+        self.screen = screen
+        self.enabled = False
+        self.timers = {name: StageTimer(self, name) for name in FrameProfiler.STAGES}
+        self.frames = deque(maxlen=window)  # recent frames, as (stage times..., total) in milliseconds
+        self.session = []   # every frame profiled since the last export
+        self.current = None     # stage times of the frame being profiled
+        self.frame_start = 0
+        self.refresh_ms = refresh_ms    # how often the overlay text is re-rendered
+        self.last_refresh = None
+        self.overlay = None
+        self.export_dir = export_dir
+        self.font = text_cache.get_font(None, 18)
+
+    def toggle(self):
+        """Switch profiling and its overlay on or off"""
+        self.enabled = not self.enabled
+        self.current = None
+        self.last_refresh = None
+
+    def stage(self, name):
+        """Return a context manager timing the named stage of the current frame"""
+        return self.timers[name] if self.enabled else FrameProfiler.NULL_STAGE
+
+    def begin_frame(self):
+        """Start timing a new frame"""
+        if self.enabled:
+            self.current = dict.fromkeys(FrameProfiler.STAGES, 0.0)
+            self.frame_start = time.perf_counter()
+
+    def end_frame(self):
+        """Finish timing the current frame and record it"""
+        if self.enabled and self.current is not None:
+            total = (time.perf_counter() - self.frame_start) * 1000
+            frame = tuple(self.current[name] for name in FrameProfiler.STAGES) + (total,)
+            self.frames.append(frame)
+            self.session.append(frame)
+            self.current = None
+
+    def get_stats(self):
+        """Return (name, rolling average, 99th percentile, time in worst frame) for each stage and the total"""
+        if not self.frames:
+            return []
+        worst = max(self.frames, key=lambda f: f[-1])
+        stats = []
+        for i, name in enumerate(FrameProfiler.STAGES + ('total',)):
+            times = sorted(frame[i] for frame in self.frames)
+            p99 = times[min(len(times) - 1, int(len(times) * 0.99))]
+            stats.append((name, sum(times) / len(times), p99, worst[i]))
+        return stats
+
+    def prep_overlay(self):
+        """Render the current statistics as an overlay image, one row per stage"""
+        rows = [('stage (ms)', 'avg', 'p99', 'worst')]
+        rows += [(name, '%.2f' % avg, '%.2f' % p99, '%.2f' % worst) for name, avg, p99, worst in self.get_stats()]
+        height = self.font.get_linesize()
+        columns = (135, 185, 235)   # right edges of the number columns
+        self.overlay = pygame.Surface((columns[-1] + 8, height * len(rows) + 8), pygame.SRCALPHA)
+        self.overlay.fill(FrameProfiler.BACKGROUND)
+        for n, row in enumerate(rows):
+            y = 4 + n * height
+            self.overlay.blit(text_cache.render(self.font, row[0], FrameProfiler.TEXT_COLOR), (4, y))
+            for text, right in zip(row[1:], columns):
+                image = text_cache.render(self.font, text, FrameProfiler.TEXT_COLOR)
+                self.overlay.blit(image, (right - image.get_width(), y))
+
+    def blit(self):
+        """Blit the overlay to the screen, refreshing its numbers every so often"""
+        if not self.enabled:
+            return
+        now = pygame.time.get_ticks()
+        if self.last_refresh is None or now - self.last_refresh >= self.refresh_ms:
+            self.prep_overlay()
+            self.last_refresh = now
+        self.screen.blit(self.overlay, (0, 0))
+
+    def export_csv(self, path=None):
+        """Write every frame profiled this session to a CSV file, then start a new session.
+        Returns the path written, or None if there was nothing to export"""
+        if not self.session:
+            return None
+        if path is None:
+            os.makedirs(self.export_dir, exist_ok=True)
+            path = os.path.join(self.export_dir, time.strftime('session-%Y%m%d-%H%M%S.csv'))
+        with open(path, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(('frame',) + FrameProfiler.STAGES + ('total',))
+            for n, frame in enumerate(self.session):
+                writer.writerow((n,) + tuple('%.4f' % t for t in frame))
+        self.session = []
+        return path
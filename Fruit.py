@@ -6,7 +6,8 @@ from Image_manager import ImageManager
 
 class Fruit(Block):
     """Inherits from maze.Block to represent a fruit available for pickup in the maze"""
-    def __init__(self, x, y, width, height):
+    def __init__(self, x, y, width, height, rng=None):
         images = ['apple.png', 'cherry.png', 'peach.png', 'strawberry.png']
-        fruit_image, _ = ImageManager(img=choice(images), resize=(width // 2, height // 2)).get_image()
+        image_choice = rng.choice(images) if rng else choice(images)
+        fruit_image, _ = ImageManager(img=image_choice, resize=(width // 2, height // 2)).get_image()
         super(Fruit, self).__init__(x, y, width, height, fruit_image)
\ No newline at end of file
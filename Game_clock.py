@@ -0,0 +1,57 @@
+import pygame
+
+
+class GameClock:
+    """Provides game time in milliseconds and event timers, either from pygame's own timer (system time)
+    or from a clock which only moves when advanced by the game loop (step time)"""
+    def __init__(self):
+        self.step_time = False
+        self.ticks = 0
+        self.timers = {}    # event type -> [interval, next due time], only used for step time
+
+    def use_system_time(self):
+        """Follow pygame's millisecond timer, and use pygame's timers for events"""
+        self.step_time = False
+        self.timers.clear()
+
+    def use_step_time(self, start=0):
+        """Only move time forward when advance is called, so that game logic can run deterministically"""
+        self.step_time = True
+        self.ticks = start
+        self.timers.clear()
+
+    def get_state(self):
+        """Return the clock's current time and timers, so that several games in one process can take turns with it"""
+        return self.step_time, self.ticks, self.timers
+
+    def set_state(self, state):
+        """Restore a time and timers returned by get_state"""
+        self.step_time, self.ticks, self.timers = state
+
+    def get_ticks(self):
+        """Return the current game time in milliseconds"""
+        if self.step_time:
+            return self.ticks
+        return pygame.time.get_ticks()
+
+    def set_timer(self, event_type, millis):
+        """Repeatedly trigger an event every given number of milliseconds, or cancel it if millis is 0"""
+        if not self.step_time:
+            pygame.time.set_timer(event_type, millis)
+        elif millis > 0:
+            self.timers[event_type] = [millis, self.ticks + millis]
+        else:
+            self.timers.pop(event_type, None)
+
+    def advance(self, millis):
+        """Move step time forward, and return the types of any timer events which came due, in order"""
+        self.ticks += millis
+        due = []
+        for event_type, timer in self.timers.items():
+            while timer[1] <= self.ticks:
+                due.append((timer[1], event_type))
+                timer[1] += timer[0]
+        return [event_type for _, event_type in sorted(due, key=lambda d: d[0])]
+
+
+game_clock = GameClock()    # clock shared by all game objects, using system time unless told otherwise
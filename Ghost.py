@@ -1,19 +1,25 @@
-from pygame import time, sysfont
-from pygame.sprite import Sprite, spritecollideany
+from pygame import sysfont
+from pygame.sprite import Sprite
 from Image_manager import ImageManager
+from Game_clock import game_clock
+from Maze import Maze, FlowField
+from Ghost_strategy import GhostStrategy
 
 
 class Ghost(Sprite):
     """Represents the enemies of PacMan which chase him around the maze"""
-    GHOST_AUDIO_CHANNEL = 1
 
-    def __init__(self, screen, maze, target, spawn_info, sound_manager, ghost_file='ghost-red.png'):
+    def __init__(self, screen, maze, target, spawn_info, sound_manager, ghost_file='ghost-red.png', chase_field=None,
+                 engine=None, strategy=None):
         super().__init__()
         self.screen = screen
         self.maze = maze
-        self.internal_map = maze.map_lines
         self.target = target
+        self.chase_field = chase_field or FlowField(maze)  # distances to the target, usually shared by all ghosts
+        self.strategy = strategy or GhostStrategy(maze, target)    # picks the tile to head for while chasing
         self.sound_manager = sound_manager
+        self.engine = None  # optional GhostEngine which moves this ghost along with all the others
+        self.slot = None    # index of this ghost's state in the engine
         self.norm_images = ImageManager(ghost_file, sheet=True, pos_offsets=[(0, 0, 32, 32), (0, 32, 32, 32)],
                                         resize=(self.maze.block_size, self.maze.block_size),
                                         animation_delay=250)
@@ -30,226 +36,196 @@ class Ghost(Sprite):
                                  keys=['r', 'u', 'd', 'l'])
         self.score_font = sysfont.SysFont(None, 22)
         self.score_image = None
+        # body frames with the eyes already drawn on, for each way the eyes can look
+        self.eyed_images = {d: self.norm_images.with_detail(self.eyes, d) for d in ('r', 'u', 'd', 'l')}
         self.image, self.rect = self.norm_images.get_image()
-        self.curr_eye, _ = self.eyes.get_image(key='r')    # default eye to looking right
-        self.image.blit(self.curr_eye, (0, 0))  # combine eyes and body
+        self.change_eyes('r')   # default eye to looking right
         self.return_tile = spawn_info[0]    # spawn tile
-        self.return_path = None     # path back to spawn tile
         self.return_delay = 1000    # 1 second delay from being eaten to returning
         self.eaten_time = None   # timestamp for being eaten
         self.start_pos = spawn_info[1]
         self.reset_position()
         self.tile = spawn_info[0]
         self.direction = None
-        self.last_position = None
         self.speed = maze.block_size / 10
+        self.step_remainder = 0     # fraction of a pixel carried over between updates
+        self.route = ''     # directions left to take along the corridor the ghost has committed to
+        self.route_step = 0
+        self.route_version = None   # navigation version the route was committed under
         self.state = {'enabled': False, 'blue': False, 'return': False, 'speed_boost': False}
         self.blue_interval = 5000   # 5 second time limit for blue status
         self.blue_start = None  # timestamp for blue status start
         self.blink = False
-        self.last_blink = time.get_ticks()
+        self.last_blink = game_clock.get_ticks()
         self.blink_interval = 250
-
-    @staticmethod
-    def find_path(maze_map, start, target):
-        """Determine a path in the maze map from the start to the target tile"""
-        path = []   # path list
-        tried = set()   # set for faster membership checks
-        done = False
-        curr_tile = start
-        while not done:
-            if curr_tile == target:
-                done = True     # if at target tile, we are done
-            else:
-                options = [     # possible moves
-                    (curr_tile[0] + 1, curr_tile[1]),
-                    (curr_tile[0] - 1, curr_tile[1]),
-                    (curr_tile[0], curr_tile[1] + 1),
-                    (curr_tile[0], curr_tile[1] - 1)
-                ]
-                test = (abs(target[0] - start[0]), abs(target[1] - start[0]))
-                prefer = test.index(max(test[0], test[1]))
-                if prefer == 0:
-                    options.sort(key=lambda x: x[0], reverse=True)
-                else:
-                    options.sort(key=lambda x: x[1], reverse=True)
-                backtrack = True    # assume we must backtrack
-                for opt in options:
-                    try:
-                        if maze_map[opt[0]][opt[1]] not in ('x', ) and opt not in tried:
-                            backtrack = False   # if we haven't tried this option before, and it's not blocked
-                            path.append(opt)    # then add to the path, and remember that it's been tried
-                            tried.add(opt)
-                            curr_tile = opt
-                            break
-                    except IndexError:
-                        continue
-                if backtrack:   # backtrack to the previous position in the path
-                    curr_tile = path.pop()
-        return path
+        if engine:
+            self.engine, self.slot = engine, engine.add(self)
 
     def increase_speed(self):
         """Increase the ghost's speed"""
         self.state['speed_boost'] = True
         self.speed = self.maze.block_size / 8
+        self.push_state()
 
     def reset_speed(self):
         """Reset the ghost's speed"""
         self.state['speed_boost'] = False
         self.speed = self.maze.block_size / 10
+        self.push_state()
 
     def reset_position(self):
         """Hard reset the ghost position back to its original location"""
         self.rect.left, self.rect.top = self.start_pos
+        self.tile = self.return_tile
+        self.step_remainder = 0
+        self.route = ''
+        self.push_state()
 
-    def get_dir_from_path(self):
-        """Return a new direction based on the next step in the current path"""
-        try:
-            next_step = self.return_path[0]
-            if next_step[0] > self.tile[0]:
-                return 'd'  # move up next
-            if next_step[0] < self.tile[0]:
-                return 'u'  # move down next
-            if next_step[1] > self.tile[1]:
-                return 'r'  # move right next
-            if next_step[1] < self.tile[1]:
-                return 'l'  # move left next
-        except IndexError as ie:
-            print('Error while trying to get new path direction', ie)
-            return None
+    def push_state(self):
+        """Copy the ghost's position, direction, speed and state into its engine, if it is moved by one"""
+        if self.engine:
+            hold_until = self.eaten_time + self.return_delay if self.state['return'] else 0
+            self.engine.set_ghost(self.slot, self.rect.topleft, self.tile, self.direction, self.speed, self.state,
+                                  hold_until)
 
     def set_eaten(self):
         """Begin the ghost's sequence for having been eaten by PacMan"""
         self.state['return'] = True
         self.state['blue'] = False
         self.tile = (self.get_nearest_row(), self.get_nearest_col())
-        self.return_path = Ghost.find_path(self.internal_map, self.tile, self.return_tile)
-        self.direction = self.get_dir_from_path()
+        self.route = ''     # heading home, off whichever corridor it was following
+        self.direction = self.direction or self.maze.next_direction(self.tile, self.return_tile)
         self.image = self.score_font.render('200', True, (255, 255, 255))
-        self.eaten_time = time.get_ticks()
-
-    def get_direction_options(self):
-        """Check if the ghost is blocked by any maze barriers and return all directions possible to move in"""
-        tests = {
-            'u': self.rect.move((0, -self.speed)),
-            'l': self.rect.move((-self.speed, 0)),
-            'd': self.rect.move((0, self.speed)),
-            'r': self.rect.move((self.speed, 0))
-        }
-        remove = []
-        original_pos = self.rect
-
-        for d, t in tests.items():
-            self.rect = t   # temporarily move self
-            if spritecollideany(self, self.maze.maze_blocks) and d not in remove:
-                remove.append(d)    # if collision, mark this direction for removal
-            if spritecollideany(self, self.target.portal_controller.blue_portal) and d not in remove:
-                remove.append(d)
-            if spritecollideany(self, self.target.portal_controller.orange_portal) and d not in remove:
-                remove.append(d)
-        for rem in remove:
-            del tests[rem]
-        self.rect = original_pos    # reset position
-        return list(tests.keys())
+        self.eaten_time = game_clock.get_ticks()
+        self.push_state()
 
     def begin_blue_state(self):
         """Switch the ghost to its blue state"""
         if not self.state['return']:
             self.state['blue'] = True
             self.image, _ = self.blue_images.get_image()
-            self.blue_start = time.get_ticks()
+            self.blue_start = game_clock.get_ticks()
+            self.push_state()
             self.sound_manager.stop()
             self.sound_manager.play_loop('blue')
 
     def change_eyes(self, look_direction):
         """Change the ghosts' eyes to look in the given direction"""
-        self.image, _ = self.norm_images.get_image()
-        self.curr_eye, _ = self.eyes.get_image(key=look_direction)
-        self.image.blit(self.curr_eye, (0, 0))  # combine eyes and body
+        self.image = self.eyed_images[look_direction][self.norm_images.image_index]
 
     def get_chase_direction(self, options):
-        """Figure out a new direction to chase in based on the target and walls"""
-        pick_direction = None
-        target_pos = (self.target.rect.centerx, self.target.rect.centery)
-        test = (abs(target_pos[0]), abs(target_pos[1]))
-        prefer = test.index(max(test[0], test[1]))
-        if prefer == 0:     # x direction
-            if target_pos[prefer] < self.rect.centerx:  # to the left
-                pick_direction = 'l'
-            elif target_pos[prefer] > self.rect.centerx:    # to the right
-                pick_direction = 'r'
-        else:   # y direction
-            if target_pos[prefer] < self.rect.centery:  # upward
-                pick_direction = 'u'
-            elif target_pos[prefer] > self.rect.centery:    # downward
-                pick_direction = 'd'
-        if pick_direction not in options:   # desired direction not available
-            if 'u' in options:  # pick a direction that is available
-                return 'u'
-            if 'l' in options:
-                return 'l'
-            if 'r' in options:
-                return 'r'
-            if 'd' in options:
-                return 'd'
-        else:   # desired direction available, return it
-            return pick_direction
+        """Figure out a new direction to chase in, toward the tile picked by the ghost's strategy"""
+        return self.strategy.choose_direction(self.tile, options) or Ghost.get_any_direction(options)
 
     def get_flee_direction(self, options):
-        """Figure out a new direction to flee in based on the target and walls"""
-        pick_direction = None
-        target_pos = (self.target.rect.centerx, self.target.rect.centery)
-        test = (abs(target_pos[0]), abs(target_pos[1]))
-        prefer = test.index(max(test[0], test[1]))
-        if prefer == 0:  # x direction
-            if target_pos[prefer] < self.rect.centerx:  # to the left, so move right
-                pick_direction = 'r'
-            elif target_pos[prefer] > self.rect.centerx:  # to the right, so move left
-                pick_direction = 'l'
-        else:  # y direction
-            if target_pos[prefer] < self.rect.centery:  # upward, so move down
-                pick_direction = 'd'
-            elif target_pos[prefer] > self.rect.centery:  # downward, so move up
-                pick_direction = 'u'
-        if pick_direction not in options:  # desired direction not available
-            if 'u' in options:  # pick a direction that is available
-                return 'u'
-            if 'l' in options:
-                return 'l'
-            if 'd' in options:
-                return 'd'
-            if 'r' in options:
-                return 'r'
-        else:  # desired direction available, return it
-            return pick_direction
+        """Figure out a new direction to flee in based on the target's flow field"""
+        return self.get_field_direction(options, away=True)
+
+    def get_field_direction(self, options, away):
+        """Pick the option leading toward (or away from) the target, using the shared flow field"""
+        self.chase_field.update(self.target.tile)   # no-op unless the target has changed tiles
+        pick_direction = self.chase_field.best_direction(self.tile, options, away=away)
+        if pick_direction is None:  # no distances here, pick a direction that is available
+            return Ghost.get_any_direction(options)
+        return pick_direction
+
+    @staticmethod
+    def get_any_direction(options):
+        """Return the first available option, for when no option leads anywhere known"""
+        for d in ('u', 'l', 'r', 'd'):
+            if d in options:
+                return d
+        return None
+
+    def get_corridor_direction(self, away=False):
+        """Return the direction to take on reaching a tile, only running the AI when the tile is a junction.
+        Leaving a junction, the ghost commits to the corridor ahead and follows its route with no lookups until
+        the next junction, unless a jump leaves the corridor or the jumps change on the way"""
+        navigation = self.maze.navigation
+        if self.route_step < len(self.route) and self.route_version == navigation.version:
+            self.route_step += 1
+            return self.route[self.route_step - 1]
+        self.route = ''
+        layout = self.maze.layout
+        n = layout.tile_index.get(self.tile)
+        if self.tile not in layout.junctions and n not in navigation.jumps:
+            turn = layout.corridor_turns.get((self.tile, self.direction))
+            if turn or n is None:
+                return turn or self.direction   # follow the corridor, or carry on if off the map
+        exits = [d for d, _ in navigation.get_neighbors(n)]   # including jumps
+        direction = self.get_flee_direction(exits) if away else self.get_chase_direction(exits)
+        corridor = layout.junctions.get(self.tile, {}).get(direction)
+        if corridor and navigation.get_jump(n, direction) is None and \
+                navigation.is_clear(self.tile, direction + corridor[2][:-1]):
+            self.route, self.route_step, self.route_version = corridor[2], 0, navigation.version
+        return direction
+
+    def get_return_direction(self):
+        """Return the next step on the shortest path back to the spawn tile, ending the return on arrival"""
+        if self.tile == self.return_tile:
+            self.state['return'] = False
+            return self.get_corridor_direction()
+        return self.maze.next_direction(self.tile, self.return_tile) or self.direction
+
+    def move(self, choose_direction):
+        """Advance the ghost by its speed, calling choose_direction for a new direction whenever the ghost
+        lines up exactly with a tile, so that it turns on the grid and needs no collision checks in between.
+        Ghosts with an engine have already been moved by it, and given their new position"""
+        if self.engine:
+            return
+        self.step_remainder += self.speed
+        distance = int(self.step_remainder)
+        self.step_remainder -= distance
+        jumped = False
+        while distance > 0:
+            self.tile = (self.get_nearest_row(), self.get_nearest_col())
+            tile_x, tile_y = self.maze.get_tile_pos(*self.tile)
+            if self.direction in ('l', 'r'):
+                self.rect.y = tile_y    # keep to the grid line of the corridor
+            elif self.direction in ('u', 'd'):
+                self.rect.x = tile_x
+            else:
+                self.rect.topleft = tile_x, tile_y  # settle onto the tile before picking a direction
+            if self.rect.topleft == (tile_x, tile_y):
+                self.direction = choose_direction()
+                jump = self.maze.navigation.get_jump(self.maze.layout.tile_index.get(self.tile), self.direction)
+                if jump is not None:    # through a teleporter or portal, at most once per update
+                    if jumped:
+                        break
+                    self.rect.topleft = self.maze.get_tile_pos(*self.maze.layout.walkable[jump])
+                    jumped = True
+                    continue
+            if self.direction in ('l', 'r'):
+                offset = self.rect.x - tile_x
+            elif self.direction in ('u', 'd'):
+                offset = self.rect.y - tile_y
+            else:
+                break
+            # never step past the point of lining up with the next tile
+            if self.direction in ('r', 'd'):
+                to_next = -offset if offset < 0 else self.maze.block_size - offset
+            else:
+                to_next = offset if offset > 0 else self.maze.block_size + offset
+            step = min(distance, to_next)
+            d_row, d_col = Maze.DIRECTION_OFFSETS[self.direction]
+            self.rect.move_ip(d_col * step, d_row * step)
+            distance -= step
 
     def get_nearest_col(self):
         """Get the current column location on the maze map"""
-        return (self.rect.left - (self.screen.get_width() // 5)) // self.maze.block_size
+        return (self.rect.centerx - self.maze.x_start) // self.maze.block_size
 
     def get_nearest_row(self):
         """Get the current row location on the maze map"""
-        return (self.rect.top - (self.screen.get_height() // 12)) // self.maze.block_size
-
-    def is_at_intersection(self):
-        """Return True if the ghost is at an intersection, False if not"""
-        directions = 0
-        self.tile = (self.get_nearest_row(), self.get_nearest_col())
-        if self.internal_map[self.tile[0] - 1][self.tile[1]] not in ('x', ):
-            directions += 1
-        if self.internal_map[self.tile[0] + 1][self.tile[1]] not in ('x', ):
-            directions += 1
-        if self.internal_map[self.tile[0]][self.tile[1] - 1] not in ('x', ):
-            directions += 1
-        if self.internal_map[self.tile[0]][self.tile[1] + 1] not in ('x', ):
-            directions += 1
-        return True if directions > 2 else False
+        return (self.rect.centery - self.maze.y_start) // self.maze.block_size
 
     def enable(self):
-        """Initialize ghost AI with the first available direction"""
-        options = self.get_direction_options()
-        self.direction = options[0]
+        """Initialize ghost AI with the first direction not blocked by any maze barriers"""
+        blockers = self.maze.TILE_WALL | self.maze.TILE_PORTAL
+        self.direction = next(d for d in ('u', 'l', 'd', 'r') if self.maze.can_move(self.rect, d, self.speed, blockers))
+        self.route = ''
         self.state['enabled'] = True
+        self.push_state()
         self.sound_manager.play_loop('std')
 
     def disable(self):
@@ -257,93 +233,50 @@ class Ghost(Sprite):
         self.direction = None   # remove direction
         self.state['enabled'] = False   # reset states
         self.state['return'] = False
-        self.return_path = None     # remove path
         if self.state['blue']:
             self.stop_blue_state(resume_audio=False)
-        self.image, _ = self.norm_images.get_image()    # reset image
+        self.change_eyes('r')   # reset image
         self.sound_manager.stop()
+        self.push_state()
 
     def stop_blue_state(self, resume_audio=True):
         """Revert back from blue state"""
         self.state['blue'] = False
         self.state['return'] = False
-        self.image, _ = self.norm_images.get_image()
+        self.change_eyes(self.direction or 'r')
         self.sound_manager.stop()
+        self.push_state()
         if resume_audio:
             self.sound_manager.play_loop('std')
 
-    def check_path_tile(self):
-        """Check if the ghost has reached the tile it's looking for in the path,
-        and if so remove it from the path"""
-        self.tile = (self.get_nearest_row(), self.get_nearest_col())
-        if self.return_path and self.tile == self.return_path[0]:
-            del self.return_path[0]
-            if not len(self.return_path) > 0:
-                return '*'  # signal that the path is complete
-        return None
-
     def update_normal(self):
         """Update logic for a normal state"""
-        options = self.get_direction_options()
-        if self.is_at_intersection() or self.last_position == (self.rect.centerx, self.rect.centery):
-            self.direction = self.get_chase_direction(options)
-        if self.direction == 'u' and 'u' in options:
-            self.rect.centery -= self.speed
-        elif self.direction == 'l' and 'l' in options:
-            self.rect.centerx -= self.speed
-        elif self.direction == 'd' and 'd' in options:
-            self.rect.centery += self.speed
-        elif self.direction == 'r' and 'r' in options:
-            self.rect.centerx += self.speed
+        self.move(self.get_corridor_direction)
+        self.norm_images.next_image()
         self.change_eyes(self.direction or 'r')  # default look direction to right
-        self.image = self.norm_images.next_image()
 
     def update_blue(self):
         """Update logic for blue state"""
         self.image = self.blue_images.next_image()
-        options = self.get_direction_options()
-        if self.is_at_intersection() or self.last_position == (self.rect.centerx, self.rect.centery):
-            self.direction = self.get_flee_direction(options)
-        # print(self.internal_map[self.tile[0]][self.tile[1]])
-        if self.direction == 'u' and 'u' in options:
-            self.rect.centery -= self.speed
-        elif self.direction == 'l' and 'l' in options:
-            self.rect.centerx -= self.speed
-        elif self.direction == 'd' and 'd' in options:
-            self.rect.centery += self.speed
-        elif self.direction == 'r' and 'r' in options:
-            self.rect.centerx += self.speed
-        if abs(self.blue_start - time.get_ticks()) > self.blue_interval:
+        self.move(lambda: self.get_corridor_direction(away=True))
+        if abs(self.blue_start - game_clock.get_ticks()) > self.blue_interval:
             self.stop_blue_state()
-        elif abs(self.blue_start - time.get_ticks()) > int(self.blue_interval * 0.5):
+        elif abs(self.blue_start - game_clock.get_ticks()) > int(self.blue_interval * 0.5):
             if self.blink:
                 self.image = self.blue_warnings.next_image()
                 self.blink = False
-                self.last_blink = time.get_ticks()
-            elif abs(self.last_blink - time.get_ticks()) > self.blink_interval:
+                self.last_blink = game_clock.get_ticks()
+            elif abs(self.last_blink - game_clock.get_ticks()) > self.blink_interval:
                 self.blink = True
 
     def update_return(self):
-        """Update logic for when returning to ghost spawn"""
-        if abs(self.eaten_time - time.get_ticks()) > self.return_delay:
-            self.image, _ = self.eyes.get_image(key=self.direction)
-            test = self.check_path_tile()
-            if test == '*':
-                self.state['return'] = False
-                self.direction = self.get_chase_direction(self.get_direction_options())
-            else:
-                self.direction = self.get_dir_from_path()
-            if self.direction == 'u':
-                self.rect.centery -= self.speed
-            elif self.direction == 'l':
-                self.rect.centerx -= self.speed
-            elif self.direction == 'd':
-                self.rect.centery += self.speed
-            elif self.direction == 'r':
-                self.rect.centerx += self.speed
+        """Update logic for when returning to ghost spawn, following the maze's shortest path table"""
+        if abs(self.eaten_time - game_clock.get_ticks()) > self.return_delay:
+            self.move(self.get_return_direction)
+            self.image, _ = self.eyes.get_image(key=self.direction or 'r')
 
     def update(self):
-        """Update the ghost position"""
+        """Update the ghost position, or only its images if an engine moves it"""
         if self.state['enabled']:
             if not self.state['blue'] and not self.state['return']:
                 self.update_normal()
@@ -351,8 +284,7 @@ class Ghost(Sprite):
                 self.update_blue()
             elif self.state['return']:
                 self.update_return()
-            self.last_position = (self.rect.centerx, self.rect.centery)
 
-    def blit(self):
-        """Blit ghost image to the screen"""
-        self.screen.blit(self.image, self.rect)
\ No newline at end of file
+    def blit(self, pos=None):
+        """Blit ghost image to the screen, at its rect or at the given (interpolated) position"""
+        self.screen.blit(self.image, pos or self.rect)
\ No newline at end of file
@@ -0,0 +1,366 @@
+from Game_clock import game_clock
+from Maze import Maze, MazeLayout
+try:
+    import numpy as np
+except ImportError:     # the engine is optional, ghosts move themselves without it
+    np = None
+
+
+class GhostEngine:
+    """Moves every ghost in one vectorized pass per update, keeping their positions, directions, speeds
+    and state flags in parallel NumPy arrays. The results are copied out to the ghost sprites in bulk at the end
+    of each update. Ghosts in their normal state are animated here too, so only blue and returning ghosts, which
+    have timers of their own, are updated sprite by sprite. Sprites push their state back in whenever the game
+    changes it"""
+
+    DIRECTIONS = ('u', 'l', 'd', 'r')   # direction codes are indexes into this, in the maze's neighbor order
+    FALLBACK_ORDER = (0, 1, 3, 2)   # u, l, r, d: order tried when the flow field has no distances
+    NO_DIRECTION = -1
+    ENABLED = 1     # state flags, combined as a bit mask
+    BLUE = 2
+    RETURN = 4
+
+    def __init__(self, maze, chase_field, capacity=8):
+        if np is None:
+            raise ImportError('The ghost engine requires NumPy')
+        self.maze = maze
+        self.chase_field = chase_field
+        self.count = 0
+        self.ghosts = []    # ghost sprite in each slot, whose strategy picks the tile it chases
+        self.x = np.zeros(capacity, dtype=np.int64)     # rect top left, in screen coordinates
+        self.y = np.zeros(capacity, dtype=np.int64)
+        self.row = np.zeros(capacity, dtype=np.int64)   # last tile the ghost's centre was seen on
+        self.col = np.zeros(capacity, dtype=np.int64)
+        self.speed = np.zeros(capacity, dtype=np.float64)
+        self.remainder = np.zeros(capacity, dtype=np.float64)   # fraction of a pixel carried over between updates
+        self.direction = np.full(capacity, GhostEngine.NO_DIRECTION, dtype=np.int64)
+        self.flags = np.zeros(capacity, dtype=np.uint8)
+        self.home = np.zeros(capacity, dtype=np.int64)  # walkable index of the tile to return to when eaten
+        self.hold_until = np.zeros(capacity, dtype=np.float64)  # game time before which the ghost stays put
+        self.frame = np.zeros(capacity, dtype=np.int64)     # normal state animation frame, and when it last changed
+        self.frame_stamp = np.zeros(capacity, dtype=np.float64)
+        self.frame_delay = np.zeros(capacity, dtype=np.float64)
+        self.frame_count = np.ones(capacity, dtype=np.int64)
+        self.shown = np.full(capacity, -1, dtype=np.int64)  # frame and facing of the sprite's image, -1 if unknown
+        self.field = None   # chase field distances as an array, rebuilt only when the field is
+        self.field_source = None
+        self.returned = np.zeros(0, dtype=bool)     # ghosts which got back to their spawn in the last update
+        self.hops = {}  # home index -> array of direction codes toward it, built on first use
+        self.compile_tables()
+
+    def compile_tables(self):
+        """Convert the maze layout's lookup tables into arrays indexed by walkable tile and direction code"""
+        layout = self.maze.layout
+        codes = {d: i for i, d in enumerate(GhostEngine.DIRECTIONS)}
+        self.rows = len(layout.tiles)
+        self.cols = max(len(row) for row in layout.tiles)
+        self.tile_index = np.full((self.rows, self.cols), -1, dtype=np.int64)
+        for n, (row, col) in enumerate(layout.walkable):
+            self.tile_index[row, col] = n
+        self.walkable_rows = np.array([row for row, _ in layout.walkable], dtype=np.int64)
+        self.walkable_cols = np.array([col for _, col in layout.walkable], dtype=np.int64)
+        count = len(layout.walkable)
+        self.neighbors = np.full((count, 4), -1, dtype=np.int64)
+        self.turns = np.full((count, 4), GhostEngine.NO_DIRECTION, dtype=np.int64)
+        for n, tile in enumerate(layout.walkable):
+            for d, m in layout.neighbors[n]:
+                self.neighbors[n, codes[d]] = m
+            if tile not in layout.junctions:
+                for d in GhostEngine.DIRECTIONS:
+                    turn = layout.corridor_turns.get((tile, d))
+                    if turn:
+                        self.turns[n, codes[d]] = codes[turn]
+        # per direction code lookups, with an extra last entry so that NO_DIRECTION (-1) indexes it
+        self.offsets = np.array([Maze.DIRECTION_OFFSETS[d] for d in GhostEngine.DIRECTIONS] + [(0, 0)],
+                                dtype=np.int64)
+        self.horizontal = np.array([d in ('l', 'r') for d in GhostEngine.DIRECTIONS] + [False])
+        self.vertical = np.array([d in ('u', 'd') for d in GhostEngine.DIRECTIONS] + [False])
+        self.backward = np.array([1 if d in ('u', 'l') else -1 for d in GhostEngine.DIRECTIONS] + [0], dtype=np.int64)
+        self.facing = np.array(list(range(len(GhostEngine.DIRECTIONS))) + [GhostEngine.DIRECTIONS.index('r')])
+        # per state flags lookups: whether the engine animates a ghost, or its sprite updates its own images
+        enabled = GhostEngine.ENABLED
+        self.normal_flags = np.array([flags == enabled for flags in range(8)])
+        self.sprite_flags = np.array([flags & enabled != 0 and flags != enabled for flags in range(8)])
+        self.walls = None   # wall and portal flags of the maze grid, re-read whenever the grid changes
+        self.walls_version = None
+        self.base_neighbors, self.base_turns = self.neighbors, self.turns
+        self.jumps = np.full((count, 4), -1, dtype=np.int64)    # index a jump in each direction leads to, or -1
+        self.navigation_version = None
+        self.sync_navigation()
+
+    def sync_navigation(self):
+        """Add the maze's current jumps (teleporters and portals) to the neighbor table, if they have changed.
+        Tiles with jumps always have a direction chosen, as corridor turns don't know about them"""
+        navigation = self.maze.navigation
+        if navigation.version == self.navigation_version:
+            return
+        self.navigation_version = navigation.version
+        self.neighbors, self.turns = self.base_neighbors.copy(), self.base_turns.copy()
+        self.jumps.fill(-1)
+        for n, jumps in navigation.jumps.items():
+            for d, m in jumps.items():
+                code = GhostEngine.DIRECTIONS.index(d)
+                self.neighbors[n, code] = self.jumps[n, code] = m
+            self.turns[n] = GhostEngine.NO_DIRECTION
+        self.hops.clear()
+
+    def lookup_tile(self, rows, cols):
+        """Return the walkable index of each (row, col), or -1 for tiles which are walls or off the map"""
+        on_map = (rows >= 0) & (rows < self.rows) & (cols >= 0) & (cols < self.cols)
+        index = np.full(rows.shape, -1, dtype=np.int64)
+        index[on_map] = self.tile_index[rows[on_map], cols[on_map]]
+        return index
+
+    def get_hops(self, home):
+        """Return the direction code of the next hop toward a home tile from every walkable tile: the first exit,
+        in direction order, which is one step closer to it"""
+        if home not in self.hops:
+            distance = np.array(self.maze.navigation.get_distances(home), dtype=np.int64)
+            open_exits = self.neighbors >= 0
+            exit_distance = np.where(open_exits, distance[np.maximum(self.neighbors, 0)], MazeLayout.UNREACHABLE)
+            closer = open_exits & (exit_distance + 1 == distance[:, None])
+            self.hops[home] = np.where(closer.any(axis=1), np.argmax(closer, axis=1), GhostEngine.NO_DIRECTION)
+        return self.hops[home]
+
+    def add(self, ghost):
+        """Add a ghost to the engine, returning the slot its state is kept in"""
+        if self.count == len(self.x):
+            for name in ('x', 'y', 'row', 'col', 'speed', 'remainder', 'direction', 'flags', 'home', 'hold_until',
+                         'frame', 'frame_stamp', 'frame_delay', 'frame_count', 'shown'):
+                array = getattr(self, name)
+                setattr(self, name, np.concatenate((array, np.zeros_like(array))))  # double the capacity
+        slot = self.count
+        self.count += 1
+        self.ghosts.append(ghost)
+        self.home[slot] = self.maze.layout.tile_index.get(ghost.return_tile, -1)
+        images = ghost.norm_images
+        self.frame[slot], self.frame_stamp[slot] = images.image_index, images.time_stamp
+        self.frame_delay[slot], self.frame_count[slot] = images.animation_delay or 0, len(images.images)
+        self.set_ghost(slot, ghost.rect.topleft, ghost.tile, ghost.direction, ghost.speed, ghost.state)
+        return slot
+
+    def set_ghost(self, slot, pos, tile, direction, speed, state, hold_until=0):
+        """Overwrite the state kept for a ghost"""
+        self.x[slot], self.y[slot] = pos
+        self.row[slot], self.col[slot] = tile
+        self.direction[slot] = GhostEngine.DIRECTIONS.index(direction) if direction else GhostEngine.NO_DIRECTION
+        if speed != self.speed[slot]:
+            self.speed[slot] = speed
+        self.flags[slot] = ((GhostEngine.ENABLED if state['enabled'] else 0) |
+                            (GhostEngine.BLUE if state['blue'] else 0) |
+                            (GhostEngine.RETURN if state['return'] else 0))
+        self.hold_until[slot] = hold_until
+        self.shown[slot] = -1   # the sprite may have changed its image along with its state
+        if not state['enabled']:
+            self.remainder[slot] = 0
+
+    def copy_out(self, slots):
+        """Copy the position, tile, direction and return flag of the ghosts in the given slots out to their sprites,
+        converting each array to a list once rather than reading it ghost by ghost"""
+        names = GhostEngine.DIRECTIONS + (None,)    # so NO_DIRECTION (-1) reads as None
+        returning = (self.flags[slots] & GhostEngine.RETURN) != 0
+        for slot, x, y, row, col, direction, is_returning in zip(
+                slots.tolist(), self.x[slots].tolist(), self.y[slots].tolist(), self.row[slots].tolist(),
+                self.col[slots].tolist(), self.direction[slots].tolist(), returning.tolist()):
+            ghost = self.ghosts[slot]
+            ghost.rect.topleft = x, y
+            ghost.tile = row, col
+            ghost.direction = names[direction]
+            ghost.state['return'] = is_returning
+
+    def update_field(self):
+        """Refresh the array copy of the chase field's distances, if the field has been rebuilt"""
+        if self.chase_field.distances is not self.field_source:
+            self.field_source = self.chase_field.distances
+            self.field = None if self.field_source is None else np.array(self.field_source, dtype=np.int64)
+
+    def choose_field_directions(self, tiles):
+        """Pick the exit from each walkable tile leading away from the chase field's target"""
+        exits = self.neighbors[tiles]
+        open_exits = exits >= 0
+        if self.field is None:
+            known = np.zeros(exits.shape, dtype=bool)
+            distance = np.zeros(exits.shape, dtype=np.int64)
+        else:
+            distance = self.field[np.where(open_exits, exits, 0)]
+            known = open_exits & (distance != MazeLayout.UNREACHABLE)
+        return self.pick_exits(open_exits, known, -distance)
+
+    def choose_target_directions(self, slots, tiles):
+        """Pick the exit from each walkable tile leading toward the tile its ghost's strategy is chasing,
+        looking up the maze's distance table row for each target"""
+        exits = self.neighbors[tiles]
+        open_exits = exits >= 0
+        distance = np.full(exits.shape, MazeLayout.UNREACHABLE, dtype=np.int64)
+        layout = self.maze.layout
+        targets = np.array([self.ghosts[slot].strategy.get_target_index(layout.walkable[tile])
+                            for slot, tile in zip(slots, tiles)], dtype=np.int64)
+        for target in np.unique(targets):
+            chasing = targets == target
+            table = np.frombuffer(self.maze.get_distances(layout.walkable[target]), dtype=np.uint16)
+            distance[chasing] = np.where(open_exits[chasing], table[np.maximum(exits[chasing], 0)],
+                                         MazeLayout.UNREACHABLE)
+        return self.pick_exits(open_exits, distance != MazeLayout.UNREACHABLE, distance)
+
+    def pick_exits(self, open_exits, known, distance):
+        """Pick the exit with the least distance in each row, breaking ties in direction order as the ghosts
+        themselves do, and falling back to the first open exit where no distances are known"""
+        masked = np.where(known, distance, np.iinfo(np.int64).max)
+        choice = np.argmin(masked, axis=1)
+        fallback_order = np.array(GhostEngine.FALLBACK_ORDER)
+        fallback = fallback_order[np.argmax(open_exits[:, fallback_order], axis=1)]
+        has_exit = open_exits.any(axis=1)
+        choice = np.where(known.any(axis=1), choice, np.where(has_exit, fallback, GhostEngine.NO_DIRECTION))
+        return choice
+
+    def choose_directions(self, slots, rows, cols):
+        """Return the new direction of each ghost in the given slots, which have lined up with a tile"""
+        directions = self.direction[slots].copy()
+        tiles = self.lookup_tile(rows, cols)
+        on_map = tiles >= 0
+        returning = (self.flags[slots] & GhostEngine.RETURN) != 0
+        arrived = returning & (tiles == self.home[slots])
+        if arrived.any():
+            self.flags[slots[arrived]] &= ~np.uint8(GhostEngine.RETURN)
+            self.returned[slots[arrived]] = True
+            returning &= ~arrived
+        for home in np.unique(self.home[slots[returning & on_map]]):   # follow the path table home
+            homing = returning & on_map & (self.home[slots] == home)
+            hops = self.get_hops(int(home))[tiles[homing]]
+            directions[homing] = np.where(hops >= 0, hops, directions[homing])
+        roaming = ~returning & on_map
+        if roaming.any():
+            current = directions[roaming]
+            turns = np.where(current >= 0, self.turns[tiles[roaming], np.maximum(current, 0)],
+                             GhostEngine.NO_DIRECTION)
+            needs_choice = turns < 0    # a junction, or a direction which doesn't match the corridor
+            if needs_choice.any():
+                chosen = tiles[roaming][needs_choice]
+                chosen_slots = slots[roaming][needs_choice]
+                away = (self.flags[chosen_slots] & GhostEngine.BLUE) != 0
+                choice = np.empty(len(chosen), dtype=np.int64)
+                if away.any():
+                    choice[away] = self.choose_field_directions(chosen[away])
+                if not away.all():
+                    choice[~away] = self.choose_target_directions(chosen_slots[~away], chosen[~away])
+                turns[needs_choice] = choice
+            directions[roaming] = turns
+        return directions   # ghosts off the map carry on in their current direction
+
+    def update(self):
+        """Advance every enabled ghost by its speed, turning on the grid just as a ghost moving itself would"""
+        if not self.count:
+            return
+        self.update_field()
+        self.sync_navigation()
+        n = self.count
+        self.returned = np.zeros(n, dtype=bool)     # ghosts which arrive back at their spawn during this update
+        moving = (self.flags[:n] & GhostEngine.ENABLED != 0) & (self.hold_until[:n] < game_clock.get_ticks())
+        moving = moving.nonzero()[0]
+        if len(moving):
+            self.move(moving)
+            self.copy_out(moving)
+        self.animate()
+
+    def move(self, moving):
+        """Advance the ghosts in the given slots by their speed, stepping at most to the next tile at a time so
+        that those lining up with a tile can turn, until each has covered its distance"""
+        remainder = self.remainder[moving] + self.speed[moving]
+        distance = remainder.astype(np.int64)   # whole pixels, carrying the fraction over to the next update
+        self.remainder[moving] = remainder - distance
+        block_size = self.maze.block_size
+        x_start, y_start = self.maze.x_start, self.maze.y_start
+        row_offset, col_offset = block_size // 2 - y_start, block_size // 2 - x_start
+        if self.maze.tile_version != self.walls_version:
+            self.walls, self.walls_version = self.read_walls(), self.maze.tile_version
+        jumped = np.zeros(len(self.x), dtype=bool)
+        slots = moving[distance > 0]
+        distance = distance[distance > 0]
+        while len(slots):
+            x, y, direction = self.x[slots], self.y[slots], self.direction[slots]
+            rows = (y + row_offset) // block_size
+            cols = (x + col_offset) // block_size
+            self.row[slots], self.col[slots] = rows, cols
+            tile_x = x_start + cols * block_size
+            tile_y = y_start + rows * block_size
+            # keep to the grid line, or settle onto the tile if stopped
+            y = np.where(self.vertical[direction], y, tile_y)
+            x = np.where(self.horizontal[direction], x, tile_x)
+            aligned = (x == tile_x) & (y == tile_y)
+            stopped = jumping = None
+            if np.count_nonzero(aligned):
+                direction[aligned] = self.choose_directions(slots[aligned], rows[aligned], cols[aligned])
+                d_row, d_col = self.offsets[direction].T
+                stopped = aligned & ((direction < 0) |  # never step into a wall
+                                     (self.wall_mask(self.walls, rows + d_row, cols + d_col) != 0))
+                tiles = self.lookup_tile(rows, cols)
+                jump_to = np.where(aligned & (tiles >= 0) & (direction >= 0),
+                                   self.jumps[np.maximum(tiles, 0), direction], -1)
+                jumping = jump_to >= 0  # through a teleporter or portal, at most once per update
+                if np.count_nonzero(jumping):
+                    stopped |= jumping & jumped[slots]   # wanting a second jump this update
+                    jumping &= ~jumped[slots]
+                    to_rows, to_cols = self.walkable_rows[jump_to[jumping]], self.walkable_cols[jump_to[jumping]]
+                    x[jumping] = x_start + to_cols * block_size
+                    y[jumping] = y_start + to_rows * block_size
+                    jumped[slots[jumping]] = True
+            else:
+                d_row, d_col = self.offsets[direction].T
+            # distance to lining up with the next tile, never stepping past it
+            to_next = ((x - tile_x + y - tile_y) * self.backward[direction] - 1) % block_size + 1
+            step = np.minimum(distance, to_next)
+            if stopped is not None:
+                step[stopped | jumping] = 0     # jumpers carry on from where they land, with their full distance
+                distance[stopped & ~jumping] = 0
+            self.x[slots] = x + d_col * step
+            self.y[slots] = y + d_row * step
+            self.direction[slots] = direction
+            distance -= step
+            more = distance > 0
+            slots, distance = slots[more], distance[more]
+
+    def animate(self):
+        """Advance every ghost's animation once it has moved. Ghosts in their normal state step their frames here
+        together, and only the sprites whose frame or facing changed are given a new image. Blue and returning
+        ghosts are left to update their own images, and ghosts which just got home show their eyes until the next
+        update, as they would moving themselves"""
+        n = self.count
+        now = game_clock.get_ticks()
+        flags = self.flags[:n]
+        if np.count_nonzero(self.returned):
+            for slot in self.returned.nonzero()[0].tolist():
+                ghost = self.ghosts[slot]
+                ghost.image, _ = ghost.eyes.get_image(key=ghost.direction or 'r')
+                self.shown[slot] = -1
+            flags = np.where(self.returned, 0, flags)   # neither animated here nor by their sprites this time
+        normal = self.normal_flags[flags]
+        due = normal & (np.abs(self.frame_stamp[:n] - now) > self.frame_delay[:n])
+        if np.count_nonzero(due):
+            self.frame[:n][due] = (self.frame[:n][due] + 1) % self.frame_count[:n][due]
+            self.frame_stamp[:n][due] = now
+        facing = self.facing[self.direction[:n]]
+        shown = self.frame[:n] * len(GhostEngine.DIRECTIONS) + facing
+        changed = (normal & (shown != self.shown[:n])).nonzero()[0]
+        if len(changed):
+            self.shown[changed] = shown[changed]
+            for slot, frame, direction in zip(changed.tolist(), self.frame[changed].tolist(),
+                                              facing[changed].tolist()):
+                ghost = self.ghosts[slot]
+                ghost.norm_images.image_index = frame
+                ghost.change_eyes(GhostEngine.DIRECTIONS[direction])
+        for slot in self.sprite_flags[flags].nonzero()[0].tolist():
+            self.ghosts[slot].update()
+
+    def read_walls(self):
+        """Return the wall and portal flags of the live maze grid as an array, to check each step against"""
+        walls = np.zeros((self.rows, self.cols), dtype=np.uint8)
+        for row, tiles in enumerate(self.maze.tile_grid[:self.rows]):
+            walls[row, :len(tiles)] = np.frombuffer(bytes(tiles[:self.cols]), dtype=np.uint8)
+        return walls & (Maze.TILE_WALL | Maze.TILE_PORTAL)
+
+    def wall_mask(self, walls, rows, cols):
+        """Return the wall flags of each (row, col), tiles off the map are open"""
+        on_map = (rows >= 0) & (rows < self.rows) & (cols >= 0) & (cols < self.cols)
+        mask = np.zeros(rows.shape, dtype=np.uint8)
+        mask[on_map] = walls[rows[on_map], cols[on_map]]
+        return mask
@@ -0,0 +1,68 @@
+from Maze import Maze, MazeLayout
+
+
+class GhostStrategy:
+    """Decides which tile a ghost heads for while chasing PacMan, and turns that target into a move by looking up
+    the maze's precomputed distances from each exit, so no searching is done while playing.
+    The base strategy heads straight for PacMan's tile"""
+    SCATTER_DISTANCE = 8    # tiles from PacMan within which a shy ghost retreats to its corner
+
+    def __init__(self, maze, target, corner=(0, 0), partner=None):
+        self.maze = maze
+        self.target = target    # PacMan
+        self.corner = maze.nearest_walkable(*corner)    # home corner, for strategies which scatter
+        self.partner = partner  # another ghost, for strategies which work off its position
+
+    def get_ahead(self, tiles):
+        """Return the tile the given number of tiles ahead of PacMan, in the direction he is facing"""
+        row, col = self.target.tile
+        d_row, d_col = Maze.DIRECTION_OFFSETS.get(self.target.direction, (0, 0))
+        return row + d_row * tiles, col + d_col * tiles
+
+    def get_target(self, tile):
+        """Return the tile a ghost on the given tile should head for, which need not be walkable"""
+        return self.target.tile
+
+    def get_target_index(self, tile):
+        """Return the walkable index of the tile a ghost on the given tile heads for, moving the target onto
+        the closest walkable tile if it is inside a wall or off the map"""
+        target = self.get_target(tile)
+        n = self.maze.layout.tile_index.get(target)
+        return n if n is not None else self.maze.layout.tile_index[self.maze.nearest_walkable(*target)]
+
+    def choose_direction(self, tile, options):
+        """Return the option whose next tile is the fewest steps from the target, or None if none have a path"""
+        distances = self.maze.get_distances(self.maze.layout.walkable[self.get_target_index(tile)])
+        tile_index = self.maze.layout.tile_index
+        best, best_distance = None, MazeLayout.UNREACHABLE
+        for d in options:
+            n = tile_index.get(self.maze.navigation.get_step(tile, d))
+            if n is not None and distances[n] < best_distance:
+                best, best_distance = d, distances[n]
+        return best
+
+
+class AmbushStrategy(GhostStrategy):
+    """Heads for the tile four tiles ahead of PacMan, to cut him off (Pinky)"""
+    def get_target(self, tile):
+        return self.get_ahead(4)
+
+
+class FlankStrategy(GhostStrategy):
+    """Heads for the tile found by doubling the vector from its partner to two tiles ahead of PacMan,
+    so the pair close in from opposite sides (Inky, partnered with Blinky)"""
+    def get_target(self, tile):
+        row, col = self.get_ahead(2)
+        if self.partner is None:
+            return row, col
+        p_row, p_col = self.partner.tile
+        return 2 * row - p_row, 2 * col - p_col
+
+
+class ShyStrategy(GhostStrategy):
+    """Chases PacMan from a distance, but retreats to its corner once it gets close (Clyde)"""
+    def get_target(self, tile):
+        distance = self.maze.tile_distance(tile, self.target.tile)
+        if distance is not None and distance < GhostStrategy.SCATTER_DISTANCE:
+            return self.corner
+        return self.target.tile
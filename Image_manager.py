@@ -1,4 +1,46 @@
 import pygame
+import threading
+from collections import OrderedDict
+from Game_clock import game_clock
+
+
+class SurfaceCache:
+    """Least recently used store of loaded image frames, shared by every image manager in the process,
+    so that identical frames are only decoded, scaled and converted once"""
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()    # key -> tuple of surfaces, least recently used first
+        self.lock = threading.Lock()    # the asset loader fills the cache from a background thread
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, load):
+        """Return the frames stored under a key, calling load to create them if they are not cached.
+        The surfaces returned are shared, so they should never be drawn onto"""
+        with self.lock:
+            frames = self.entries.get(key)
+            if frames is not None:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return frames
+            self.misses += 1
+        frames = tuple(load())  # loaded outside the lock, since loading may itself use the cache
+        with self.lock:
+            frames = self.entries.setdefault(key, frames)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)    # evict the least recently used frames
+        return frames
+
+    def load_file(self, img):
+        """Return the decoded image file, loading it only the first time it is asked for"""
+        return self.get((img,), lambda: [pygame.image.load('Images/' + img)])[0]
+
+    def clear(self):
+        """Forget all cached frames"""
+        self.entries.clear()
+
+
+surface_cache = SurfaceCache()  # cache shared by all image managers
 
 
 class ImageManager:
@@ -8,40 +50,80 @@ class ImageManager:
                  convert=True, transparency=True,
                  animation_delay=None, reversible=False,
                  repeat=True):
-        if not sheet:
-            self.images = [pygame.image.load('images/' + img)]  # single image
+        convert = convert and pygame.display.get_surface() is not None  # converting needs a display mode
+        # frames are cached by how they were made: (file, offsets, resize, convert, transparency, x flip, y flip)
+        self.load_key = (img, tuple(tuple(rect) for rect in pos_offsets) if sheet else None,
+                         tuple(resize) if resize else None, convert, transparency)
+        self.flipped = (False, False)
+        self.keys = keys
+        if keys and not len(keys) == len(pos_offsets if sheet else [img]):
+            raise ValueError('Must provide same number of keys as images')
+        frames = surface_cache.get(self.load_key + self.flipped, self.load_frames)
+        self.orientations = {self.flipped: self.arrange_frames(frames)}    # (x flip, y flip) -> frames
+        if sheet:   # sprite sheets get every orientation up front, so turning never creates surfaces
+            for flipped in ((True, False), (False, True), (True, True)):
+                self.orientations[flipped] = self.arrange_frames(self.get_flipped_frames(flipped))
+        self.images = self.orientations[self.flipped]
+        self.rect = frames[0].get_rect()
+        if not keys:
+            self.image_index = 0
+        self.animation_delay = animation_delay
+        self.time_stamp = game_clock.get_ticks()
+        self.reversible = reversible
+        self.repeat = repeat
+
+    def load_frames(self):
+        """Load, slice, resize, convert and colorkey the unflipped frames described by the load key"""
+        img, pos_offsets, resize, convert, transparency = self.load_key
+        source = surface_cache.load_file(img)
+        if pos_offsets:
+            images = self.extract_images(source, pos_offsets)
         else:
-            self.sheet = pygame.image.load('images/' + img)
-            self.pos_offsets = pos_offsets  # get images from sprite sheet, using offsets
-            self.images = self.extract_images()
+            images = [source.copy()]    # single image, copied so the decoded file stays untouched
         if resize:  # apply resizing
-            self.images = [pygame.transform.scale(img, resize) for img in self.images]
-        self.rect = self.images[0].get_rect()
+            images = [pygame.transform.scale(img, resize) for img in images]
         if convert:
-            self.images = [img.convert() for img in self.images]
+            images = [img.convert() for img in images]
         if transparency:
-            for i in self.images:
+            for i in images:
                 i.set_colorkey((0, 0, 0, 0))
-        if keys:    # if keys provided, use keys instead of index value for getting images
-            if not len(keys) == len(self.images):
-                raise ValueError('Must provide same number of keys as images')
-            images_dict = dict()
-            for k, i in zip(keys, range(len(self.images))):
-                images_dict[k] = self.images[i]
-            self.images = images_dict
-        else:
-            self.image_index = 0
-        self.animation_delay = animation_delay
-        self.time_stamp = pygame.time.get_ticks()
-        self.reversible = reversible
-        self.repeat = repeat
+        return images
+
+    def get_flipped_frames(self, flipped):
+        """Return the cached frames flipped in the x and/or y directions, flipping the unflipped frames if needed"""
+        base_key = self.load_key + (False, False)
+        return surface_cache.get(self.load_key + flipped, lambda: [
+            pygame.transform.flip(img, *flipped) for img in surface_cache.get(base_key, self.load_frames)])
+
+    def with_detail(self, detail, detail_key=None):
+        """Return this manager's frames, in sheet order, with an image from another manager (e.g. a ghost's eyes)
+        drawn over each one. The combined frames are composed once and cached, and the plain frames stay untouched"""
+        detail_image, _ = detail.get_image(key=detail_key)
+        flipped = self.flipped
+
+        def compose():
+            frames = [img.copy() for img in self.get_flipped_frames(flipped)]
+            for img in frames:
+                img.blit(detail_image, (0, 0))
+            return frames
+        return surface_cache.get(self.load_key + flipped + (detail.load_key + detail.flipped, detail_key), compose)
+
+    def arrange_frames(self, frames):
+        """Arrange frames by key if keys were provided, or in an (own, reversible) list otherwise"""
+        if self.keys:   # if keys provided, use keys instead of index value for getting images
+            return dict(zip(self.keys, frames))
+        return list(frames)
+
+    def orient(self, x_flip=False, y_flip=False):
+        """Switch to the frames flipped in the x and/or y directions, relative to the sheet as loaded"""
+        self.flipped = (x_flip, y_flip)
+        if self.flipped not in self.orientations:     # single images only flip on demand
+            self.orientations[self.flipped] = self.arrange_frames(self.get_flipped_frames(self.flipped))
+        self.images = self.orientations[self.flipped]
 
     def flip(self, x_bool=True, y_bool=False):
         """Flip images in the y, x, or both directions"""
-        if isinstance(self.images, dict):
-            self.images = {v: pygame.transform.flip(v, x_bool, y_bool) for k, v in self.images.items()}
-        else:
-            self.images = [pygame.transform.flip(x, x_bool, y_bool) for x in self.images]
+        self.orient(self.flipped[0] != x_bool, self.flipped[1] != y_bool)
 
     def get_image(self, key=None):
         """Returns image information that is useful for displaying the image"""
@@ -63,24 +145,26 @@ class ImageManager:
         if not self.repeat and self.image_index + 1 >= len(self.images):
             return self.images[self.image_index]
         if self.reversible and self.image_index + 1 >= len(self.images):
-            self.images.reverse()
+            for images in self.orientations.values():
+                images.reverse()    # keep every orientation in step
         if not self.animation_delay:
             self.image_index = (self.image_index + 1) % len(self.images)
         else:
-            if abs(self.time_stamp - pygame.time.get_ticks()) > self.animation_delay:
+            if abs(self.time_stamp - game_clock.get_ticks()) > self.animation_delay:
                 self.image_index = (self.image_index + 1) % len(self.images)
-                self.time_stamp = pygame.time.get_ticks()
+                self.time_stamp = game_clock.get_ticks()
 
         return self.images[self.image_index]
 
-    def extract_images(self):
+    @staticmethod
+    def extract_images(sheet, pos_offsets):
         """Extract a list of images from their respective positions and offsets in a sprite sheet"""
-        if not self.sheet:
-            raise ValueError('Image manager has no sprite sheet to extract images from')
         result = []
-        for rect in self.pos_offsets:
+        for rect in pos_offsets:
             select = pygame.Rect(rect)
-            sub_image = pygame.Surface(select.size).convert(pygame.display.get_surface())
-            sub_image.blit(self.sheet, (0, 0), select)
+            sub_image = pygame.Surface(select.size)
+            if pygame.display.get_surface():
+                sub_image = sub_image.convert(pygame.display.get_surface())
+            sub_image.blit(sheet, (0, 0), select)
             result.append(sub_image)
-        return result
\ No newline at end of file
+        return result
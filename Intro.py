@@ -1,6 +1,8 @@
 import pygame
 from Image_manager import ImageManager
+from Game_clock import game_clock
 from Score import ScoreBoard
+from Text_cache import text_cache
 
 
 class SimpleAnimation(pygame.sprite.Sprite):
@@ -17,20 +19,21 @@ class SimpleAnimation(pygame.sprite.Sprite):
             self.image_manager.flip()
         self.image, self.rect = self.image_manager.get_image()
         if detail:
-            self.detail_piece = ImageManager(detail, sheet=True, pos_offsets=sheet_offsets,
-                                             resize=resize).all_images()[0]     # grab first image in detail sheet
+            detail_images = ImageManager(detail, sheet=True, pos_offsets=sheet_offsets, resize=resize)
             if flip:
                 self.image_manager.flip()
-            self.image.blit(self.detail_piece, (0, 0))  # combine detail
+            # frames with the first image in the detail sheet drawn over them, composed once
+            self.detail_frames = self.image_manager.with_detail(detail_images)
+            self.image = self.detail_frames[self.image_manager.image_index]
         else:
-            self.detail_piece = None
+            self.detail_frames = None
         self.rect.centerx, self.rect.centery = pos
 
     def update(self):
         """Update to the next image in the animation"""
         self.image = self.image_manager.next_image()
-        if self.detail_piece:
-            self.image.blit(self.detail_piece, (0, 0))     # combine detail
+        if self.detail_frames:
+            self.image = self.detail_frames[self.image_manager.image_index]    # combined detail
 
     def blit(self):
         """Blit the current image to the screen"""
@@ -44,7 +47,7 @@ class TitleCard(pygame.sprite.Sprite):
         self.screen = screen
         self.text = text
         self.color = color
-        self.font = pygame.font.SysFont(None, size)
+        self.font = text_cache.get_font(None, size)
         self.image = None
         self.rect = None
         self.pos = pos
@@ -59,7 +62,7 @@ class TitleCard(pygame.sprite.Sprite):
 
     def prep_image(self):
         """Render the text as an image to be displayed"""
-        self.image = self.font.render(self.text, True, self.color)
+        self.image = text_cache.render(self.font, self.text, self.color)
         self.rect = self.image.get_rect()
         self.position()
 
@@ -153,18 +156,20 @@ class Intro:
     """Handles the display and continuation of an introductory cut-scene"""
     def __init__(self, screen):
         self.screen = screen
-        self.ghost_intros = [
-            ChaseScene(screen, chasers=['ghost-red.png', 'ghost-pink.png',
-                                        'ghost-lblue.png', 'ghost-orange.png'],
-                       chased=['pacman-horiz.png'], chaser_detail='ghost-eyes.png'),
-            ChaseScene(screen, chasers=['ghost-ppellet.png', 'ghost-ppellet.png',
-                                        'ghost-ppellet.png', 'ghost-ppellet.png'],
-                       chased=['pacman-horiz.png'], reverse=True),
-            GhostIntro(screen, 'ghost-red.png', 'Blinky'),
-            GhostIntro(screen, 'ghost-pink.png', 'Pinky'),
-            GhostIntro(screen, 'ghost-lblue.png', 'Inky'),
-            GhostIntro(screen, 'ghost-orange.png', 'Clyde')
+        # scenes are only built when they are first shown, so the menu appears sooner
+        self.scene_makers = [
+            lambda: ChaseScene(screen, chasers=['ghost-red.png', 'ghost-pink.png',
+                                                'ghost-lblue.png', 'ghost-orange.png'],
+                               chased=['pacman-horiz.png'], chaser_detail='ghost-eyes.png'),
+            lambda: ChaseScene(screen, chasers=['ghost-ppellet.png', 'ghost-ppellet.png',
+                                                'ghost-ppellet.png', 'ghost-ppellet.png'],
+                               chased=['pacman-horiz.png'], reverse=True),
+            lambda: GhostIntro(screen, 'ghost-red.png', 'Blinky'),
+            lambda: GhostIntro(screen, 'ghost-pink.png', 'Pinky'),
+            lambda: GhostIntro(screen, 'ghost-lblue.png', 'Inky'),
+            lambda: GhostIntro(screen, 'ghost-orange.png', 'Clyde')
         ]
+        self.ghost_intros = [None] * len(self.scene_makers)
         self.run = set()
         self.intro_index = 0
         self.last_intro_start = None
@@ -173,16 +178,22 @@ class Intro:
     def update(self):
         """Progress the intro sequence"""
         if not self.last_intro_start:
-            self.last_intro_start = pygame.time.get_ticks()
-        elif abs(self.last_intro_start - pygame.time.get_ticks()) > self.intro_time:
+            self.last_intro_start = game_clock.get_ticks()
+        elif abs(self.last_intro_start - game_clock.get_ticks()) > self.intro_time:
             self.run.add(self.intro_index)
             self.intro_index = (self.intro_index + 1) % len(self.ghost_intros)
-            self.last_intro_start = pygame.time.get_ticks()
+            self.last_intro_start = game_clock.get_ticks()
         if self.intro_index in (0, 1) and self.intro_index in self.run:
-            self.ghost_intros[self.intro_index].reset_positions()
+            self.get_scene().reset_positions()
             self.run.remove(self.intro_index)
-        self.ghost_intros[self.intro_index].update()
+        self.get_scene().update()
+
+    def get_scene(self):
+        """Return the current scene of the intro sequence, building it the first time it is shown"""
+        if self.ghost_intros[self.intro_index] is None:
+            self.ghost_intros[self.intro_index] = self.scene_makers[self.intro_index]()
+        return self.ghost_intros[self.intro_index]
 
     def blit(self):
         """Blit the intro sequence to the screen"""
-        self.ghost_intros[self.intro_index].blit()
\ No newline at end of file
+        self.get_scene().blit()
\ No newline at end of file
@@ -1,6 +1,7 @@
 import pygame
 from Score import ScoreBoard
 from Image_manager import ImageManager
+from Text_cache import text_cache
 
 
 class ImageRow:
@@ -8,13 +9,13 @@ class ImageRow:
     def __init__(self, screen, img, count, label, pos=(0, 0), color=ScoreBoard.SCORE_WHITE):
         self.screen = screen
         if isinstance(img, str):
-            self.image = pygame.image.load('images/' + img)
+            self.image = pygame.image.load('Images/' + img)
         else:
             self.image = img
         self.image_count = None
         self.image_rects = None
         self.color = color
-        self.font = pygame.font.SysFont(None, 36)
+        self.font = text_cache.get_font(None, 36)
         self.text = label
         self.text_image = None
         self.text_image_rect = None
@@ -31,7 +32,7 @@ class ImageRow:
 
     def render_text(self):
         """Render the text as an image to be displayed"""
-        self.text_image = self.font.render(self.text, True, self.color)
+        self.text_image = text_cache.render(self.font, self.text, self.color)
         self.text_image_rect = self.text_image.get_rect()
 
     def update(self, n_count):
@@ -1,7 +1,14 @@
 import pygame
+import hashlib
+import json
+import os
+import re
+import tempfile
+from array import array
+from collections import deque
 from Block import Block
 from Fruit import Fruit
-from random import randrange
+import random
 
 
 class Teleporter:
@@ -19,17 +26,364 @@ class Teleporter:
                 other.x, other.y = (self.block_1.x + self.block_1.width), self.block_1.y
 
 
+class MazeLayout:
+    """The immutable, compiled form of a maze map file, which is cached on disk and keyed by the map file's hash"""
+
+    CACHE_DIR = 'maze_cache'
+    FORMAT_VERSION = 6
+    UNREACHABLE = 0xFFFF    # distance table value for tiles with no path between them
+
+    def __init__(self, data):
+        self.lines = tuple(data['lines'])   # raw map text, one string per row
+        self.tiles = tuple(bytes(row) for row in data['tiles'])     # initial occupancy flags per tile
+        self.pellets = tuple(bytes(row) for row in data['pellets'])     # pellet sites per tile
+        self.walls = tuple(tuple(wall) for wall in data['walls'])   # (row, col, x, y) for each wall tile
+        self.shields = tuple(tuple(shield) for shield in data['shields'])
+        self.player_spawn = (tuple(data['player_spawn'][0]), tuple(data['player_spawn'][1]))
+        self.ghost_spawns = tuple((tuple(tile), tuple(pos)) for tile, pos in data['ghost_spawns'])
+        self.teleports = tuple((tuple(tile), tuple(pos)) for tile, pos in data['teleports'])
+        self.walkable = tuple(tuple(tile) for tile in data['walkable'])     # every tile that is not a wall
+        self.tile_index = {tile: n for n, tile in enumerate(self.walkable)}
+        self.distances = tuple(array('H', row) for row in data['distances'])    # [target index][start index]
+        self.nearest = tuple(array('H', row) for row in data['nearest'])    # [row][col] -> closest walkable index
+        self.neighbors = MazeLayout.find_neighbors(self.walkable, self.tile_index)  # (direction, index) by index
+        self.junctions = {tuple(tile): {} for tile in data['junction_tiles']}   # tile -> {direction: corridor}
+        for row, col, d, end_row, end_col, length, route in data['corridors']:
+            # corridor end junction, its length, and the direction to take on each tile along the way
+            self.junctions[(row, col)][d] = ((end_row, end_col), length, route)
+        # (tile, direction moving in) -> direction to continue in, for tiles in the middle of a corridor
+        self.corridor_turns = {((row, col), d_in): d_out for row, col, d_in, d_out in data['corridor_turns']}
+
+    @staticmethod
+    def compile(lines, block_size, x_start, y_start):
+        """Parse the lines of a maze map into a JSON-friendly layout description"""
+        width = max(len(line.rstrip('\r\n')) for line in lines)
+        data = {'lines': lines, 'tiles': [[0] * width for _ in lines], 'pellets': [[0] * width for _ in lines],
+                'walls': [], 'shields': [], 'player_spawn': None, 'ghost_spawns': [], 'teleports': []}
+        for i, line in enumerate(lines):
+            for j, co in enumerate(line.rstrip('\r\n')):
+                x, y = x_start + (j * block_size), y_start + (i * block_size)
+                if co == 'x':
+                    data['tiles'][i][j] = Maze.TILE_WALL
+                    data['walls'].append((i, j, x, y))
+                elif co == '*':
+                    data['pellets'][i][j] = Maze.PELLET     # may be swapped for fruit when the maze is built
+                elif co == '@':
+                    data['pellets'][i][j] = Maze.POWER_PELLET
+                elif co == 's':
+                    data['tiles'][i][j] = Maze.TILE_SHIELD
+                    data['shields'].append((i, j, x, y))
+                elif co == 'o':
+                    data['player_spawn'] = ((i, j), (x + (block_size // 2), y + (block_size // 2)))
+                elif co == 'g':
+                    data['ghost_spawns'].append(((i, j), (x, y)))
+                elif co == 't':
+                    data['teleports'].append(((i, j), (x, y)))
+        data['walkable'] = [(i, j) for i, row in enumerate(data['tiles'])
+                            for j, kind in enumerate(row) if not kind & Maze.TILE_WALL]
+        data['distances'] = MazeLayout.compile_paths(data['walkable'])
+        data['nearest'] = MazeLayout.compile_nearest(data['walkable'], len(lines), width)
+        data['junction_tiles'], data['corridors'], data['corridor_turns'] = \
+            MazeLayout.compile_junctions(data['walkable'])
+        return data
+
+    @staticmethod
+    def compile_junctions(walkable):
+        """Split the walkable tiles into junctions (any tile that is not a plain piece of corridor) and the corridors
+        joining them, returning the junction tiles, the corridors leaving each junction and the turns within corridors.
+        Each corridor keeps its route, the directions taken on the tiles between its two junctions"""
+        index = {tuple(tile): n for n, tile in enumerate(walkable)}
+        neighbors = MazeLayout.find_neighbors(walkable, index)
+        junctions = [n for n in range(len(walkable)) if len(neighbors[n]) != 2]
+        junction_set = set(junctions)
+        turns = {}
+        for n in range(len(walkable)):
+            if n not in junction_set:   # corridor tile, leave by whichever side wasn't entered from
+                (d_1, _), (d_2, _) = neighbors[n]
+                turns[(n, Maze.OPPOSITE_DIRECTIONS[d_1])] = d_2
+                turns[(n, Maze.OPPOSITE_DIRECTIONS[d_2])] = d_1
+        corridors = []
+        for n in junctions:
+            for d, m in neighbors[n]:
+                length, direction, route = 1, d, []
+                while m not in junction_set and length <= len(walkable):    # follow the corridor to its end
+                    direction = turns[(m, direction)]
+                    route.append(direction)
+                    m = dict(neighbors[m])[direction]
+                    length += 1
+                corridors.append((*walkable[n], d, *walkable[m], length, ''.join(route)))
+        corridor_turns = [(*walkable[n], d_in, d_out) for (n, d_in), d_out in turns.items()]
+        return [walkable[n] for n in junctions], corridors, corridor_turns
+
+    @staticmethod
+    def find_neighbors(walkable, index):
+        """Return the (direction, index) pairs of the walkable tiles next to each walkable tile"""
+        neighbors = []
+        for row, col in walkable:
+            neighbors.append(tuple((d, index[(row + d_row, col + d_col)])
+                                   for d, (d_row, d_col) in Maze.DIRECTION_OFFSETS.items()
+                                   if (row + d_row, col + d_col) in index))
+        return tuple(neighbors)
+
+    @staticmethod
+    def compile_nearest(walkable, rows, cols):
+        """Breadth-first search out from all walkable tiles at once, across walls too, to find the closest walkable
+        tile to every tile of the map, so that any tile can stand in as a target"""
+        nearest = [[MazeLayout.UNREACHABLE] * cols for _ in range(rows)]
+        queue = deque()
+        for n, (row, col) in enumerate(walkable):
+            nearest[row][col] = n
+            queue.append((row, col))
+        while queue:
+            row, col = queue.popleft()
+            for d_row, d_col in Maze.DIRECTION_OFFSETS.values():
+                r, c = row + d_row, col + d_col
+                if 0 <= r < rows and 0 <= c < cols and nearest[r][c] == MazeLayout.UNREACHABLE:
+                    nearest[r][c] = nearest[row][col]
+                    queue.append((r, c))
+        return nearest
+
+    @staticmethod
+    def compile_paths(walkable):
+        """Breadth-first search out from every walkable tile to build an all-pairs distance table"""
+        index = {tuple(tile): n for n, tile in enumerate(walkable)}
+        neighbors = MazeLayout.find_neighbors(walkable, index)
+        distances = []
+        for target in range(len(walkable)):
+            dist = [MazeLayout.UNREACHABLE] * len(walkable)
+            dist[target] = 0
+            queue = deque([target])
+            while queue:
+                n = queue.popleft()
+                for _, m in neighbors[n]:
+                    if dist[m] == MazeLayout.UNREACHABLE:
+                        dist[m] = dist[n] + 1
+                        queue.append(m)
+            distances.append(dist)
+        return distances
+
+    @classmethod
+    def load(cls, map_file, block_size, x_start, y_start):
+        """Return the compiled layout for a map file, compiling and caching it if it is not cached yet"""
+        with open(map_file, 'rb') as file:
+            raw = file.read()
+        stem = os.path.splitext(os.path.basename(map_file))[0]
+        params = repr((cls.FORMAT_VERSION, block_size, x_start, y_start)).encode()
+        cache_file = os.path.join(cls.CACHE_DIR, '%s-v%d-%s.json' % (stem, cls.FORMAT_VERSION,
+                                                                     hashlib.sha1(raw + params).hexdigest()))
+        try:
+            with open(cache_file, 'r') as file:
+                return cls(json.load(file))
+        except (FileNotFoundError, ValueError, KeyError, TypeError):
+            pass    # not cached yet, or the cache file is unreadable
+        data = cls.compile(raw.decode().splitlines(keepends=True), block_size, x_start, y_start)
+        temp_file = None
+        try:
+            os.makedirs(cls.CACHE_DIR, exist_ok=True)
+            # written beside the cache file and moved into place, so that other processes compiling the same map
+            # never read it half written
+            with tempfile.NamedTemporaryFile('w', dir=cls.CACHE_DIR, suffix='.tmp', delete=False) as file:
+                temp_file = file.name
+                json.dump(data, file)
+            os.replace(temp_file, cache_file)
+            cls.prune_cache(stem)
+        except OSError as e:
+            print('Unable to cache maze layout', e)
+            if temp_file and os.path.exists(temp_file):
+                os.remove(temp_file)
+        return cls(data)
+
+    @classmethod
+    def prune_cache(cls, stem):
+        """Delete the map's cached layouts from other format versions, and any cached before files were named
+        after their map"""
+        stale = re.compile(r'(%s-v(?!%d-)\d+-)?[0-9a-f]{40}\.json' % (re.escape(stem), cls.FORMAT_VERSION))
+        for name in os.listdir(cls.CACHE_DIR):
+            if stale.fullmatch(name):
+                try:
+                    os.remove(os.path.join(cls.CACHE_DIR, name))
+                except FileNotFoundError:
+                    pass    # already pruned by another process
+
+
+class NavigationGraph:
+    """The maze's walkable tiles and the moves between them, including jumps which are not a step to a neighboring
+    tile: through the teleporter at each end of the tunnel, and between the tiles in front of a linked pair of
+    portals. Distances start from the layout's precomputed table, and each jump is patched in on top of it,
+    one target row at a time as rows are asked for, so portals can open and close without any searching"""
+    def __init__(self, maze):
+        self.layout = maze.layout
+        self.teleporter_jumps = []  # (from index, direction, to index), fixed for the layout
+        if len(self.layout.teleports) == 2:     # the teleporter sends each end to beside the other end
+            ((row_1, col_1), _), ((row_2, col_2), _) = self.layout.teleports
+            self.teleporter_jumps = self.make_jumps((((row_1, col_1), 'l', (row_2, col_2 - 1)),
+                                                     ((row_2, col_2), 'r', (row_1, col_1 + 1))))
+        self.teleport_jumps = self.teleporter_jumps     # the teleporter jumps, while they are open
+        self.portal_jumps = []  # jumps through the current pair of portals, if there is one
+        self.jumps = {}     # from index -> {direction: to index}
+        self.neighbors = {}     # index -> (direction, index) moves in direction order, for tiles with jumps
+        self.rows = {}  # (jump count, target index) -> distances to the target using the first jump count jumps
+        self.version = 0    # changes whenever the jumps do, so that copies of the graph know to refresh
+        self.set_jumps()
+
+    def make_jumps(self, moves):
+        """Return (from index, direction, to index) for each (from tile, direction, to tile) between walkable tiles"""
+        index = self.layout.tile_index
+        return [(index[start], d, index[end]) for start, d, end in moves if start in index and end in index]
+
+    def set_jumps(self):
+        """Rebuild the jump lookups after the jumps change, dropping any distance rows which used the old ones"""
+        self.jumps = {}
+        for start, d, end in self.teleport_jumps + self.portal_jumps:
+            self.jumps.setdefault(start, {})[d] = end
+        order = tuple(Maze.DIRECTION_OFFSETS)
+        self.neighbors = {n: tuple(sorted(self.layout.neighbors[n] + tuple(jumps.items()),
+                                          key=lambda move: order.index(move[0])))
+                          for n, jumps in self.jumps.items()}
+        fixed = len(self.teleport_jumps)    # rows using only the teleporters stay valid
+        self.rows = {key: row for key, row in self.rows.items() if key[0] <= fixed}
+        self.version += 1
+
+    def set_teleports(self, enabled):
+        """Open or close the teleporter jumps, as ghosts may only use the tunnel on later levels"""
+        teleport_jumps = self.teleporter_jumps if enabled else []
+        if teleport_jumps != self.teleport_jumps:
+            self.teleport_jumps = teleport_jumps
+            self.rows = {}  # every row was patched on top of the old teleporter jumps
+            self.set_jumps()
+
+    def set_portals(self, portal_1=None, portal_2=None):
+        """Link the tiles in front of two portals, each given as (tile, direction it faces), or unlink them"""
+        moves = []
+        if portal_1 and portal_2:
+            fronts = []
+            for (row, col), facing in (portal_1, portal_2):
+                d_row, d_col = Maze.DIRECTION_OFFSETS[facing]
+                fronts.append(((row + d_row, col + d_col), Maze.OPPOSITE_DIRECTIONS[facing]))
+            (front_1, into_1), (front_2, into_2) = fronts
+            moves = ((front_1, into_1, front_2), (front_2, into_2, front_1))    # step into one, come out the other
+        portal_jumps = self.make_jumps(moves)
+        if portal_jumps != self.portal_jumps:
+            self.portal_jumps = portal_jumps
+            self.set_jumps()
+
+    def get_neighbors(self, n):
+        """Return the (direction, index) moves out of a walkable tile, jumps included, in direction order"""
+        return self.neighbors.get(n) or self.layout.neighbors[n]
+
+    def get_jump(self, n, direction):
+        """Return the index a jump in the given direction leads to from a walkable tile, or None"""
+        jumps = self.jumps.get(n)
+        return jumps.get(direction) if jumps else None
+
+    def is_clear(self, tile, moves):
+        """Return True if no jump leaves any of the tiles reached by making the moves from a tile, in order"""
+        if not self.jumps:
+            return True
+        row, col = tile
+        for d in moves:
+            d_row, d_col = Maze.DIRECTION_OFFSETS[d]
+            row, col = row + d_row, col + d_col
+            if self.layout.tile_index.get((row, col)) in self.jumps:
+                return False
+        return True
+
+    def get_step(self, tile, direction):
+        """Return the tile a move in the given direction leads to from a tile, following any jump"""
+        jump = self.get_jump(self.layout.tile_index.get(tile), direction)
+        if jump is not None:
+            return self.layout.walkable[jump]
+        d_row, d_col = Maze.DIRECTION_OFFSETS[direction]
+        return tile[0] + d_row, tile[1] + d_col
+
+    def get_distances(self, target, jump_count=None):
+        """Return the distance from every walkable tile to the target index, using the first jump_count jumps
+        (all of them by default). Each jump u -> v can only shorten a path s -> t to s -> u, jump, v -> t,
+        so a row is the row without the jump, lowered wherever going through the jump is shorter"""
+        jumps = self.teleport_jumps + self.portal_jumps
+        if jump_count is None:
+            jump_count = len(jumps)
+        if jump_count == 0:
+            return self.layout.distances[target]
+        row = self.rows.get((jump_count, target))
+        if row is None:
+            start, _, end = jumps[jump_count - 1]
+            before = self.get_distances(target, jump_count - 1)
+            via = before[end] + 1
+            if via >= MazeLayout.UNREACHABLE:
+                row = before    # the jump doesn't lead anywhere near the target
+            else:
+                to_start = self.get_distances(start, jump_count - 1)
+                row = array('H', [min(d, s + via) if s != MazeLayout.UNREACHABLE else d
+                                  for d, s in zip(before, to_start)])
+            self.rows[(jump_count, target)] = row
+        return row
+
+
+class FlowField:
+    """Walking distance from every tile in the maze to a single target tile, shared by everything heading there"""
+    def __init__(self, maze):
+        self.maze = maze
+        self.target = None
+        self.version = None     # navigation graph version the field was taken from
+        self.distances = None   # distance to the target, indexed the same as the maze layout's walkable tiles
+
+    def update(self, target):
+        """Take the distances to the target from the maze's navigation graph, but only if the target has moved
+        to a new tile or the maze's jumps have changed"""
+        navigation = self.maze.navigation
+        if target == self.target and navigation.version == self.version:
+            return
+        self.target = target
+        self.version = navigation.version
+        start = self.maze.layout.tile_index.get(target)
+        if start is None:
+            return  # target is off the walkable map (e.g. in a tunnel), keep the last field
+        self.distances = navigation.get_distances(start)
+
+    def get_distance(self, tile):
+        """Return the distance from a tile to the target, or None if it is unknown"""
+        n = self.maze.layout.tile_index.get(tile)
+        if n is None or self.distances is None or self.distances[n] == MazeLayout.UNREACHABLE:
+            return None
+        return self.distances[n]
+
+    def best_direction(self, tile, options, away=False):
+        """Return the option leading to the neighboring tile closest to the target
+        (or furthest from it, if away is True), or None if the field has no distances there"""
+        best, best_distance = None, None
+        for d in options:
+            distance = self.get_distance(self.maze.navigation.get_step(tile, d))
+            if distance is not None and (best_distance is None or
+                                         (distance > best_distance if away else distance < best_distance)):
+                best, best_distance = d, distance
+        return best
+
+
 class Maze:
     """Represents the maze displayed to the screen"""
 
     NEON_BLUE = (25, 25, 166)
     WHITE = (255, 255, 255)
     PELLET_YELLOW = (255, 255, 0)
+    TILE_OPEN = 0   # tile occupancy flags, combined as a bit mask when checking for blockers
+    TILE_WALL = 1
+    TILE_SHIELD = 2
+    TILE_PORTAL = 4
+    PELLET_NONE = 0     # pellet store kinds
+    PELLET = 1
+    POWER_PELLET = 2
+    FRUIT = 3
+    DIRECTION_OFFSETS = {'u': (-1, 0), 'l': (0, -1), 'd': (1, 0), 'r': (0, 1)}   # (row, col) change per direction
+    OPPOSITE_DIRECTIONS = {'u': 'd', 'l': 'r', 'd': 'u', 'r': 'l'}
 
-    def __init__(self, screen, maze_map_file):
+    def __init__(self, screen, maze_map_file, rng=None):
         self.screen = screen
+        self.rng = rng or random.Random()   # seed-able source of randomness for fruit placement
         self.map_file = maze_map_file
         self.block_size = 20
+        self.x_start = screen.get_width() // 5     # screen position of the top left maze tile
+        self.y_start = screen.get_height() // 12
         self.block_image = pygame.Surface((self.block_size, self.block_size))   # create a block surface
         self.block_image.fill(Maze.NEON_BLUE)
         self.shield_image = pygame.Surface((self.block_size, self.block_size // 2))     # create a shield surface
@@ -40,90 +394,215 @@ class Maze:
         self.ppellet_image = pygame.Surface((self.block_size // 2, self.block_size // 2))  # create a pellet surface
         pygame.draw.circle(self.ppellet_image, Maze.WHITE,  # draw power pellet onto pellet surface
                            (self.block_size // 4, self.block_size // 4), self.block_size // 4)
-        with open(self.map_file, 'r') as file:
-            self.map_lines = file.readlines()
+        self.layout = MazeLayout.load(self.map_file, self.block_size, self.x_start, self.y_start)
+        self.navigation = NavigationGraph(self)     # moves between tiles, through teleporters and portals too
+        self.map_lines = list(self.layout.lines)
+        self.wall_sprites = [Block(x, y, self.block_size, self.block_size, self.block_image)
+                             for _, _, x, y in self.layout.walls]   # created once, re-used by every rebuild
+        # wall sprites by (row, col), for portals to take out of the maze and put back
+        self.wall_blocks = {(i, j): block for (i, j, _, _), block in zip(self.layout.walls, self.wall_sprites)}
+        self.shield_sprites = [Block(x, y, self.block_size // 2, self.block_size // 2, self.shield_image)
+                               for _, _, x, y in self.layout.shields]
         self.maze_blocks = pygame.sprite.Group()    # maze assets
         self.shield_blocks = pygame.sprite.Group()
-        self.pellets = pygame.sprite.Group()
-        self.power_pellets = pygame.sprite.Group()
-        self.fruits = pygame.sprite.Group()
+        self.fruits = {}    # fruit sprites by (row, col), used for their randomly chosen images
+        self.tile_grid = []     # occupancy flags for each tile, indexed by [row][col]
+        self.tile_version = 0   # counts changes to the tile grid, so copies of it know when to refresh
+        self.pellet_grid = []   # pellet kind for each tile, indexed by [row][col]
+        self.pellet_count = 0   # pellets and power pellets remaining
+        self.base_wall_layer = None     # walls and shields as compiled, before any portals change them
+        self.wall_layer = None      # pre-rendered background of walls and shields
+        self.pellet_layer = None    # pre-rendered pellets and fruit, erased as they are eaten
         self.teleport = None
+        if len(self.layout.teleports) == 2:
+            (_, pos_1), (_, pos_2) = self.layout.teleports
+            self.teleport = Teleporter(pygame.Rect(pos_1, (self.block_size, self.block_size)),
+                                       pygame.Rect(pos_2, (self.block_size, self.block_size)))
         self.player_spawn = None    # spawn points
         self.ghost_spawn = []
+        self.observation = None     # optional observation grids, told about every change to the maze
         self.build_maze()   # init maze from file data
 
     def pellets_left(self):
         """Return True if the maze still has pellets, False if not"""
-        return True if self.pellets or self.power_pellets else False
+        return self.pellet_count > 0
 
     def build_maze(self):
-        """Build the maze layout based on the maze map text file"""
-        # reset maze assets if they exist already
-        if self.maze_blocks or self.pellets or self.fruits or self.power_pellets or self.shield_blocks:
-            self.maze_blocks.empty()
-            self.pellets.empty()
-            self.power_pellets.empty()
-            self.fruits.empty()
-            self.shield_blocks.empty()
-        if len(self.ghost_spawn) > 0:
-            self.ghost_spawn.clear()
-        teleport_points = []
-        y_start = self.screen.get_height() // 12
-        y = 0
-        for i in range(len(self.map_lines)):
-            line = self.map_lines[i]
-            x_start = self.screen.get_width() // 5
-            x = 0
-            for j in range(len(line)):
-                co = line[j]
-                if co == 'x':
-                    self.maze_blocks.add(Block(x_start + (x * self.block_size),
-                                               y_start + (y * self.block_size),
-                                               self.block_size, self.block_size,
-                                               self.block_image))
-                elif co == '*':
-                    if randrange(0, 100) > 1:
-                        self.pellets.add(Block(x_start + (self.block_size // 3) + (x * self.block_size),
-                                               y_start + (self.block_size // 3) + (y * self.block_size),
-                                               self.block_size, self.block_size,
-                                               self.pellet_image))
-                    else:
-                        self.fruits.add(Fruit(x_start + (self.block_size // 4) + (x * self.block_size),
-                                              y_start + (self.block_size // 4) + (y * self.block_size),
-                                              self.block_size, self.block_size))
-                elif co == '@':
-                    self.power_pellets.add(Block(x_start + (self.block_size // 3) + (x * self.block_size),
-                                                 y_start + (self.block_size // 3) + (y * self.block_size),
-                                                 self.block_size, self.block_size,
-                                                 self.ppellet_image))
-                elif co == 's':
-                    self.shield_blocks.add(Block(x_start + (x * self.block_size),
-                                                 y_start + (y * self.block_size),
-                                                 self.block_size // 2, self.block_size // 2,
-                                                 self.shield_image))
-                elif co == 'o':
-                    self.player_spawn = [(i, j), (x_start + (x * self.block_size) + (self.block_size // 2),
-                                         y_start + (y * self.block_size) + (self.block_size // 2))]
-                elif co == 'g':
-                    self.ghost_spawn.append(((i, j), (x_start + (x * self.block_size),
-                                            y_start + (y * self.block_size))))
-                elif co == 't':
-                    teleport_points.append(pygame.Rect(x_start + (x * self.block_size),
-                                                       y_start + (y * self.block_size),
-                                                       self.block_size, self.block_size))
-                x += 1
-            y += 1
-        if len(teleport_points) == 2:
-            self.teleport = Teleporter(teleport_points[0], teleport_points[1])
+        """Reset the walls, shields, pellets and spawn points to their initial state from the compiled layout"""
+        self.maze_blocks.empty()
+        self.maze_blocks.add(*self.wall_sprites)
+        self.shield_blocks.empty()
+        self.shield_blocks.add(*self.shield_sprites)
+        self.fruits.clear()
+        self.tile_grid = [bytearray(row) for row in self.layout.tiles]
+        self.tile_version += 1
+        self.pellet_grid = [bytearray(row) for row in self.layout.pellets]
+        self.pellet_count = 0
+        for i, row in enumerate(self.pellet_grid):
+            for j, kind in enumerate(row):
+                if kind == Maze.PELLET and not self.rng.randrange(0, 100) > 1:   # small chance of fruit instead of a pellet
+                    row[j] = Maze.FRUIT
+                    self.fruits[(i, j)] = Fruit(self.x_start + (self.block_size // 4) + (j * self.block_size),
+                                                self.y_start + (self.block_size // 4) + (i * self.block_size),
+                                                self.block_size, self.block_size, self.rng)
+                elif kind:
+                    self.pellet_count += 1
+        self.player_spawn = self.layout.player_spawn
+        self.ghost_spawn = list(self.layout.ghost_spawns)
+        self.navigation.set_portals()   # any portals were turned back into walls
+        self.render_layers()
+        if self.observation:
+            self.observation.rebuild()
+
+    def render_layers(self):
+        """Draw the walls and pellets once onto cached surfaces, so each frame only has to blit the layers"""
+        if self.base_wall_layer is None:
+            self.base_wall_layer = pygame.Surface(self.screen.get_size(), 0, self.screen)
+            self.base_wall_layer.fill((0, 0, 0))
+            self.maze_blocks.draw(self.base_wall_layer)
+            self.shield_blocks.draw(self.base_wall_layer)
+        self.wall_layer = self.base_wall_layer.copy()
+        self.pellet_layer = pygame.Surface(self.screen.get_size(), 0, self.screen)
+        self.pellet_layer.fill((0, 0, 0))
+        self.pellet_layer.set_colorkey((0, 0, 0))   # let the wall layer show through
+        for i, row in enumerate(self.pellet_grid):
+            for j, kind in enumerate(row):
+                if kind:
+                    self.pellet_layer.blit(*self.get_pellet_image(i, j, kind))
+
+    def get_pellet_image(self, row, col, kind):
+        """Return the image for a pellet kind, and the position it is drawn at for the given tile"""
+        if kind == Maze.FRUIT:
+            fruit = self.fruits[(row, col)]
+            return fruit.image, fruit.rect.topleft
+        image = self.pellet_image if kind == Maze.PELLET else self.ppellet_image
+        return image, (self.x_start + (self.block_size // 3) + (col * self.block_size),
+                       self.y_start + (self.block_size // 3) + (row * self.block_size))
+
+    def render_tile(self, row, col):
+        """Redraw a single tile of the wall layer after its occupancy has changed"""
+        if self.wall_layer is None:
+            return
+        x, y = self.x_start + (col * self.block_size), self.y_start + (row * self.block_size)
+        self.wall_layer.fill((0, 0, 0), (x, y, self.block_size, self.block_size))
+        kind = self.get_tile(row, col)
+        if kind & Maze.TILE_WALL:
+            self.wall_layer.blit(self.block_image, (x, y))
+        elif kind & Maze.TILE_SHIELD:
+            self.wall_layer.blit(self.shield_image, (x, y))
+
+    def eat_pellet(self, row, col):
+        """Remove any pellet or fruit on the given tile, erase it from the pellet layer, and return its kind"""
+        if not (0 <= row < len(self.pellet_grid) and 0 <= col < len(self.pellet_grid[row])):
+            return Maze.PELLET_NONE
+        kind = self.pellet_grid[row][col]
+        if kind:
+            image, pos = self.get_pellet_image(row, col, kind)
+            self.pellet_layer.fill((0, 0, 0), (pos, image.get_size()))
+            self.pellet_grid[row][col] = Maze.PELLET_NONE
+            if kind == Maze.FRUIT:
+                del self.fruits[(row, col)]
+            else:
+                self.pellet_count -= 1
+            if self.observation:
+                self.observation.clear_pellet(row, col, kind)
+        return kind
+
+    def get_tile(self, row, col):
+        """Return the occupancy flags for a tile, tiles outside of the map are open"""
+        if 0 <= row < len(self.tile_grid) and 0 <= col < len(self.tile_grid[row]):
+            return self.tile_grid[row][col]
+        return Maze.TILE_OPEN
+
+    def set_tile(self, row, col, kind):
+        """Set the occupancy flags for a tile"""
+        if 0 <= row < len(self.tile_grid) and 0 <= col < len(self.tile_grid[row]):
+            previous = self.tile_grid[row][col]
+            self.tile_grid[row][col] = kind
+            self.tile_version += 1
+            if (previous ^ kind) & (Maze.TILE_WALL | Maze.TILE_SHIELD):
+                self.render_tile(row, col)  # only walls and shields appear on the wall layer
+            if self.observation:
+                self.observation.set_tile(row, col, kind)
+
+    def get_tile_pos(self, row, col):
+        """Convert a (row, col) tile to the screen coordinates of its top left corner"""
+        return self.x_start + (col * self.block_size), self.y_start + (row * self.block_size)
+
+    def tile_distance(self, start, target):
+        """Return the length in moves of the shortest path between two tiles, or None if there is no path"""
+        try:
+            distance = self.navigation.get_distances(self.layout.tile_index[target])[self.layout.tile_index[start]]
+        except KeyError:
+            return None
+        return None if distance == MazeLayout.UNREACHABLE else distance
+
+    def nearest_walkable(self, row, col):
+        """Return the walkable tile closest to any (row, col), including tiles inside walls or off the map"""
+        nearest = self.layout.nearest
+        row = min(max(row, 0), len(nearest) - 1)
+        col = min(max(col, 0), len(nearest[row]) - 1)
+        return self.layout.walkable[nearest[row][col]]
+
+    def get_distances(self, target):
+        """Return the distance from every walkable tile to a walkable target tile, indexed the same as the
+        layout's walkable tiles, or None if the target is not walkable"""
+        n = self.layout.tile_index.get(target)
+        return None if n is None else self.navigation.get_distances(n)
+
+    def next_step(self, start, target):
+        """Return the direction of the first move along the shortest path between two tiles, and the tile it leads
+        to (which is not next to the start for a jump through a teleporter or portal), or None if there is none"""
+        n, t = self.layout.tile_index.get(start), self.layout.tile_index.get(target)
+        if n is None or t is None:
+            return None
+        distances = self.navigation.get_distances(t)
+        if distances[n] == MazeLayout.UNREACHABLE:
+            return None
+        for d, m in self.navigation.get_neighbors(n):
+            if distances[m] + 1 == distances[n]:    # the first move one step closer, in direction order
+                return d, self.layout.walkable[m]
+        return None     # already at the target
+
+    def next_direction(self, start, target):
+        """Return the first direction to move along the shortest path between two tiles, or None if there is none"""
+        step = self.next_step(start, target)
+        return step[0] if step else None
+
+    def find_path(self, start, target):
+        """Return the tiles along the shortest path from the start to the target tile, not including the start"""
+        path = []
+        step = self.next_step(start, target)
+        while step:
+            start = step[1]
+            path.append(start)
+            step = self.next_step(start, target)
+        return path
+
+    def tile_from_pos(self, x, y):
+        """Convert screen coordinates to the (row, col) of the tile containing them"""
+        return (y - self.y_start) // self.block_size, (x - self.x_start) // self.block_size
+
+    def can_move(self, rect, direction, distance, blockers=TILE_WALL):
+        """Return True if the rect can move the distance in the given direction
+        without overlapping any tile flagged with one of the blockers"""
+        d_row, d_col = Maze.DIRECTION_OFFSETS[direction]
+        test = rect.move((d_col * distance, d_row * distance))
+        top, left = self.tile_from_pos(test.left, test.top)
+        bottom, right = self.tile_from_pos(test.right - 1, test.bottom - 1)
+        for row in range(top, bottom + 1):
+            for col in range(left, right + 1):
+                if self.get_tile(row, col) & blockers:
+                    return False
+        return True
 
     def remove_shields(self):
         """Remove any shields from the maze"""
+        for shield in self.shield_blocks:
+            self.set_tile(*self.tile_from_pos(shield.rect.x, shield.rect.y), Maze.TILE_OPEN)
         self.shield_blocks.empty()
 
     def blit(self):
-        """Blit all maze blocks to the screen"""
-        self.maze_blocks.draw(self.screen)
-        self.pellets.draw(self.screen)
-        self.power_pellets.draw(self.screen)
-        self.fruits.draw(self.screen)
-        self.shield_blocks.draw(self.screen)
\ No newline at end of file
+        """Blit the pre-rendered maze layers to the screen"""
+        self.screen.blit(self.wall_layer, (0, 0))
+        self.screen.blit(self.pellet_layer, (0, 0))
\ No newline at end of file
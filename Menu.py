@@ -1,6 +1,7 @@
 import pygame
 from Pacman import PacMan
 from Intro import TitleCard
+from Text_cache import text_cache
 
 
 class Button:
@@ -12,12 +13,13 @@ class Button:
         # Dimensions and properties of the button
         self.text_color = text_color
         self.alt_color = alt_color
-        self.font = pygame.font.SysFont(None, size)
+        self.font = text_cache.get_font(None, size)
         self.pos = pos
 
         # Prep button message
         self.msg = msg
         self.msg_image, self.msg_image_rect = None, None
+        self.msg_color = None
         self.prep_msg(self.text_color)
 
     def check_button(self, mouse_x, mouse_y):
@@ -29,14 +31,14 @@ class Button:
 
     def alter_text_color(self, mouse_x, mouse_y):
         """Change text color if the mouse coordinates collide with the button"""
-        if self.check_button(mouse_x, mouse_y):
-            self.prep_msg(self.alt_color)
-        else:
-            self.prep_msg(self.text_color)
+        color = self.alt_color if self.check_button(mouse_x, mouse_y) else self.text_color
+        if color != self.msg_color:     # only re-render when the color actually changes
+            self.prep_msg(color)
 
     def prep_msg(self, color):
         """Turn msg into a rendered image and center it on the button"""
-        self.msg_image = self.font.render(self.msg, True, color)
+        self.msg_color = color
+        self.msg_image = text_cache.render(self.font, self.msg, color)
         self.msg_image_rect = self.msg_image.get_rect()
         self.msg_image_rect.centerx, self.msg_image_rect.centery = self.pos
 
@@ -0,0 +1,78 @@
+from Maze import Maze
+try:
+    import numpy as np
+except ImportError:     # observations are optional, the game runs without them
+    np = None
+
+
+class MazeObservation:
+    """The state of the maze as a stack of NumPy grids, one channel per kind of thing, for bots and analytics.
+    The maze reports each pellet eaten and each tile changed, and actors are only moved between cells when they
+    change tile or state, so the grids are never rebuilt during play. Consumers read them through a read-only view"""
+    CHANNELS = ('walls', 'pellets', 'power_pellets', 'fruit', 'shields', 'portals',
+                'pacman', 'ghosts', 'blue_ghosts', 'returning_ghosts')
+    WALLS, PELLETS, POWER_PELLETS, FRUIT, SHIELDS, PORTALS, PACMAN, GHOSTS, BLUE_GHOSTS, RETURNING_GHOSTS = \
+        range(len(CHANNELS))
+    PELLET_CHANNELS = {Maze.PELLET: PELLETS, Maze.POWER_PELLET: POWER_PELLETS, Maze.FRUIT: FRUIT}
+    TILE_CHANNELS = ((Maze.TILE_WALL, WALLS), (Maze.TILE_SHIELD, SHIELDS), (Maze.TILE_PORTAL, PORTALS))
+
+    def __init__(self, maze, player, ghosts):
+        if np is None:
+            raise ImportError('Maze observations require NumPy')
+        self.maze = maze
+        self.player = player
+        self.ghosts = ghosts
+        rows, cols = len(maze.layout.tiles), len(maze.layout.tiles[0])
+        self.grid = np.zeros((len(MazeObservation.CHANNELS), rows, cols), dtype=np.uint8)
+        self.view = self.grid.view()    # shares the grid's memory, but can't be written to
+        self.view.flags.writeable = False
+        self.actors = {}    # actor -> (channel, row, col) it is currently marked at
+        maze.observation = self     # the maze now reports its changes here
+        self.rebuild()
+
+    def rebuild(self):
+        """Fill the maze channels from the maze's tile and pellet grids, after the maze is built or rebuilt"""
+        shape = self.grid.shape[1:]
+        tiles = np.frombuffer(b''.join(self.maze.tile_grid), dtype=np.uint8).reshape(shape)
+        pellets = np.frombuffer(b''.join(self.maze.pellet_grid), dtype=np.uint8).reshape(shape)
+        for flag, channel in MazeObservation.TILE_CHANNELS:
+            self.grid[channel] = (tiles & flag) != 0
+        for kind, channel in MazeObservation.PELLET_CHANNELS.items():
+            self.grid[channel] = pellets == kind
+
+    def set_tile(self, row, col, kind):
+        """Update the wall, shield and portal channels for a tile whose occupancy flags changed"""
+        for flag, channel in MazeObservation.TILE_CHANNELS:
+            self.grid[channel, row, col] = (kind & flag) != 0
+
+    def clear_pellet(self, row, col, kind):
+        """Remove a pellet or fruit that was eaten"""
+        self.grid[MazeObservation.PELLET_CHANNELS[kind], row, col] = 0
+
+    def get_ghost_channel(self, ghost):
+        """Return the channel a ghost is marked in, given its state"""
+        if ghost.state['return']:
+            return MazeObservation.RETURNING_GHOSTS
+        if ghost.state['blue']:
+            return MazeObservation.BLUE_GHOSTS
+        return MazeObservation.GHOSTS
+
+    def move_actor(self, actor, channel, row, col):
+        """Move an actor's mark to a new channel and tile, if either has changed"""
+        mark = (channel, row, col)
+        old = self.actors.get(actor)
+        if old == mark:
+            return
+        if old is not None:
+            self.grid[old] -= 1
+        if 0 <= row < self.grid.shape[1] and 0 <= col < self.grid.shape[2]:
+            self.grid[mark] += 1    # several ghosts may share a tile, so actor channels count them
+            self.actors[actor] = mark
+        else:
+            self.actors.pop(actor, None)    # off the grid, e.g. passing through a teleport
+
+    def update_actors(self):
+        """Move PacMan and the ghosts to their current tiles and states. Call once per logic update"""
+        self.move_actor(self.player, MazeObservation.PACMAN, *self.player.tile)
+        for g in self.ghosts:
+            self.move_actor(g, self.get_ghost_channel(g), *g.tile)
@@ -7,7 +7,9 @@ from Portal import PortalController
 class PacMan(pygame.sprite.Sprite):
     """Represents the player character 'PacMan' and its related logic/control"""
     PAC_YELLOW = (255, 255, 0)
-    PAC_AUDIO_CHANNEL = 0
+    # sprite sheet and (x flip, y flip) orientation of it used for each direction
+    FACING = {'u': ('vertical_images', (False, False)), 'l': ('horizontal_images', (True, False)),
+              'd': ('vertical_images', (False, True)), 'r': ('horizontal_images', (False, False))}
 
     def __init__(self, screen, maze):
         super().__init__()
@@ -17,7 +19,7 @@ class PacMan(pygame.sprite.Sprite):
         self.sound_manager = SoundManager(sound_files=['pacman_chomp.wav', 'pacman_eatfruit.wav',
                                                        'pacman_death.wav', 'pacman-portal.wav'],
                                           keys=['chomp', 'eatfruit', 'death', 'portal'],
-                                          channel=PacMan.PAC_AUDIO_CHANNEL)
+                                          priority=SoundManager.PRIORITY_NORMAL)
         self.horizontal_images = ImageManager('pacman-horiz.png', sheet=True, pos_offsets=[(0, 0, 32, 32),
                                                                                            (32, 0, 32, 32),
                                                                                            (0, 32, 32, 32),
@@ -40,7 +42,7 @@ class PacMan(pygame.sprite.Sprite):
                                                                                       (32, 64, 32, 32)],
                                          resize=(self.maze.block_size, self.maze.block_size),
                                          animation_delay=150, repeat=False)
-        self.flip_status = {'use_horiz': True, 'h_flip': False, 'v_flip': False}
+        self.move_images = self.horizontal_images   # frames for the current direction of movement
         self.spawn_info = self.maze.player_spawn[1]
         self.tile = self.maze.player_spawn[0]
         self.direction = None
@@ -73,7 +75,7 @@ class PacMan(pygame.sprite.Sprite):
 
     def set_death(self):
         """Set the death flag for PacMan and begin the death animation"""
-        self.sound_manager.play('dead')
+        self.sound_manager.play('death', priority=SoundManager.PRIORITY_HIGH)
         self.dead = True
         self.image, _ = self.death_images.get_image()
 
@@ -86,6 +88,7 @@ class PacMan(pygame.sprite.Sprite):
     def reset_position(self):
         """Reset position back to pre-define spawn location"""
         self.rect.centerx, self.rect.centery = self.spawn_info  # screen coordinates for spawn
+        self.tile = self.maze.player_spawn[0]
 
     def reset_direction(self, event):
         """Reset the movement direction if key-up on movement keys"""
@@ -97,77 +100,53 @@ class PacMan(pygame.sprite.Sprite):
         if event.key in self.action_map:
             self.action_map[event.key]()
 
+    def face(self, direction):
+        """Turn to face a direction, selecting the sprite sheet and its precomputed orientation for it"""
+        self.direction = direction
+        sheet, flipped = PacMan.FACING[direction]
+        self.move_images = getattr(self, sheet)
+        self.move_images.orient(*flipped)
+
     def set_move_up(self):
         """Set move direction up"""
         if self.direction != 'u':
-            self.direction = 'u'
-            if self.flip_status['v_flip']:
-                self.vertical_images.flip(False, True)
-                self.flip_status['v_flip'] = False
-            self.flip_status['use_horiz'] = False
+            self.face('u')
         self.moving = True
 
     def set_move_left(self):
         """Set move direction left"""
         if self.direction != 'l':
-            self.direction = 'l'
-            if not self.flip_status['h_flip']:
-                self.horizontal_images.flip()
-                self.flip_status['h_flip'] = True
-            self.flip_status['use_horiz'] = True
+            self.face('l')
         self.moving = True
 
     def set_move_down(self):
         """Set move direction down"""
         if self.direction != 'd':
-            self.direction = 'd'
-            if not self.flip_status['v_flip']:
-                self.vertical_images.flip(x_bool=False, y_bool=True)
-                self.flip_status['v_flip'] = True
-            self.flip_status['use_horiz'] = False
+            self.face('d')
         self.moving = True
 
     def set_move_right(self):
         """Set move direction to right"""
         if self.direction != 'r':
-            self.direction = 'r'
-            if self.flip_status['h_flip']:
-                self.horizontal_images.flip()
-                self.flip_status['h_flip'] = False
-            self.flip_status['use_horiz'] = True
+            self.face('r')
         self.moving = True
 
     def get_nearest_col(self):
         """Get the current column location on the maze map"""
-        return (self.rect.x - (self.screen.get_width() // 5)) // self.maze.block_size
+        return (self.rect.centerx - self.maze.x_start) // self.maze.block_size
 
     def get_nearest_row(self):
         """Get the current row location on the maze map"""
-        return (self.rect.y - (self.screen.get_height() // 12)) // self.maze.block_size
+        return (self.rect.centery - self.maze.y_start) // self.maze.block_size
 
     def is_blocked(self):
         """Check if PacMan is blocked by any maze barriers, return True if blocked, False if clear"""
         result = False
         if self.direction is not None and self.moving:
-            original_pos = self.rect
-            if self.direction == 'u':
-                test = self.rect.move((0, -self.speed))
-            elif self.direction == 'l':
-                test = self.rect.move((-self.speed, 0))
-            elif self.direction == 'd':
-                test = self.rect.move((0, self.speed))
-            else:
-                test = self.rect.move((self.speed, 0))
-            self.rect = test    # temporarily move self
-
-            # if any collision, result = True
-            if pygame.sprite.spritecollideany(self, self.maze.maze_blocks):
-                result = True
-            elif pygame.sprite.spritecollideany(self, self.maze.shield_blocks):
-                result = True
-            elif not self.portal_controller.portables_usable():
-                result = self.portal_controller.collide_portals(self)
-            self.rect = original_pos    # reset position
+            blockers = self.maze.TILE_WALL | self.maze.TILE_SHIELD
+            if not self.portal_controller.portables_usable():
+                blockers |= self.maze.TILE_PORTAL   # portals only act as walls until both are open
+            result = not self.maze.can_move(self.rect, self.direction, self.speed, blockers)
         return result
 
     def update(self):
@@ -176,10 +155,7 @@ class PacMan(pygame.sprite.Sprite):
             self.portal_controller.update()
             self.portal_controller.check_portals(self)
             if self.direction and self.moving:
-                if self.flip_status['use_horiz']:
-                    self.image = self.horizontal_images.next_image()
-                else:
-                    self.image = self.vertical_images.next_image()
+                self.image = self.move_images.next_image()
                 if not self.is_blocked():
                     if self.direction == 'u':
                         self.rect.centery -= self.speed
@@ -189,34 +165,29 @@ class PacMan(pygame.sprite.Sprite):
                         self.rect.centery += self.speed
                     elif self.direction == 'r':
                         self.rect.centerx += self.speed
-                self.tile = (self.get_nearest_row(), self.get_nearest_col())
+            self.tile = (self.get_nearest_row(), self.get_nearest_col())   # may also change from portal travel
         else:
             self.image = self.death_images.next_image()
 
-    def blit(self):
-        """Blit the PacMan sprite to the screen"""
+    def blit(self, pos=None):
+        """Blit the PacMan sprite to the screen, at its rect or at the given (interpolated) position"""
         self.portal_controller.blit()
-        self.screen.blit(self.image, self.rect)
+        self.screen.blit(self.image, pos or self.rect)
 
     def eat(self):
         """Eat pellets from the maze and return the score accumulated"""
         score = 0
         fruit_count = 0
         power = None
-        collision = pygame.sprite.spritecollideany(self, self.maze.pellets)
-        if collision:
-            collision.kill()
+        kind = self.maze.eat_pellet(*self.tile)
+        if kind == self.maze.PELLET:
             score += 10
             self.sound_manager.play('chomp')
-        collision = pygame.sprite.spritecollideany(self, self.maze.fruits)
-        if collision:
-            collision.kill()
+        elif kind == self.maze.FRUIT:
             score += 20
             fruit_count += 1
             self.sound_manager.play('eatfruit')
-        collision = pygame.sprite.spritecollideany(self, self.maze.power_pellets)
-        if collision:
-            collision.kill()
+        elif kind == self.maze.POWER_PELLET:
             score += 20
             power = True
             self.sound_manager.play('chomp')
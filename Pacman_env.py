@@ -0,0 +1,185 @@
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')   # environments never open a window or sound device
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import multiprocessing
+import random
+import pygame
+from Game_clock import game_clock
+from Pacman_game import PacManPortalGame
+try:
+    import numpy as np
+except ImportError:     # only the environments need NumPy, the game itself does not
+    np = None
+
+
+class PacManEnv:
+    """A reset/step environment around a headless game, for training and evaluating agents.
+    Actions are indexes into ACTIONS, each pressing a key from PacMan's action map, releasing the last arrow key
+    pressed so that PacMan stops, or doing nothing.
+    Observations are the game's maze observation grids, one channel per kind of thing (see MazeObservation).
+    Rewards are the points scored, and an episode ends when the game is over or max_ticks have passed"""
+    RELEASE = 'release'     # action which lets go of the held arrow key, as PacMan's key-up handler expects
+    ACTIONS = (None, pygame.K_UP, pygame.K_LEFT, pygame.K_DOWN, pygame.K_RIGHT, pygame.K_q, pygame.K_w, RELEASE)
+    ARROW_KEYS = (pygame.K_UP, pygame.K_LEFT, pygame.K_DOWN, pygame.K_RIGHT)
+
+    def __init__(self, seed=None, frame_skip=1, max_ticks=20000, ghost_engine=False, skip_transition=True):
+        if np is None:
+            raise ImportError('The PacMan environments require NumPy')
+        self.rng = random.Random(seed)  # picks the seed of each episode's game
+        self.frame_skip = frame_skip    # logic ticks run for each action
+        self.max_ticks = max_ticks
+        self.ghost_engine = ghost_engine
+        self.skip_transition = skip_transition  # run the opening level transition during reset
+        self.game = None
+        self.clock_state = None     # this environment's game clock, swapped in while its game runs
+        self.action_count = len(PacManEnv.ACTIONS)
+        self.last_score = 0
+        self.held_key = None    # last arrow key pressed, until it is released
+
+    def reset(self, seed=None):
+        """Start a new game, returning the first observation and an info dict"""
+        if seed is not None:
+            self.rng.seed(seed)
+        game_clock.set_state((True, 0, {}))     # fresh clock, so other games sharing the process are unaffected
+        self.game = PacManPortalGame(headless=True, seed=self.rng.randrange(1 << 32), ghost_engine=self.ghost_engine)
+        self.game.start_game()
+        self.held_key = None
+        while self.skip_transition and self.game.level_transition.transition_show:
+            self.game.step()
+        self.clock_state = game_clock.get_state()
+        self.last_score = self.game.score_keeper.score
+        return self.observe(), self.get_info()
+
+    def step(self, action):
+        """Press (or release) the action's key, then run frame_skip ticks of the game.
+        Returns (observation, reward, terminated, truncated, info)"""
+        game = self.game
+        game_clock.set_state(self.clock_state)
+        game.step(self.get_events(PacManEnv.ACTIONS[action]))
+        for _ in range(self.frame_skip - 1):
+            if game.game_over:
+                break
+            game.step()
+        self.clock_state = game_clock.get_state()
+        reward = game.score_keeper.score - self.last_score
+        self.last_score = game.score_keeper.score
+        terminated = game.game_over
+        truncated = not terminated and game.tick_count >= self.max_ticks
+        return self.observe(), reward, terminated, truncated, self.get_info()
+
+    def get_events(self, key):
+        """Return the input events for an action's key: a key-down, a key-up for the held arrow key, or none"""
+        if key == PacManEnv.RELEASE:
+            if self.held_key is None:
+                return ()
+            key, self.held_key = self.held_key, None
+            return [pygame.event.Event(pygame.KEYUP, key=key)]
+        if key is None:
+            return ()
+        if key in PacManEnv.ARROW_KEYS:
+            self.held_key = key
+        return [pygame.event.Event(pygame.KEYDOWN, key=key)]
+
+    def observe(self):
+        """Return the game's observation grids, as a read-only view which changes as the game runs"""
+        return self.game.get_observation()
+
+    def get_info(self):
+        """Return details of the game which are not part of the observation"""
+        game = self.game
+        return {'score': game.score_keeper.score, 'lives': game.life_counter.lives, 'level': game.score_keeper.level,
+                'ticks': game.tick_count, 'seed': game.seed}
+
+    def close(self):
+        """Let go of the game"""
+        self.game = None
+
+
+def run_worker(conn, env_count, env_kwargs):
+    """Host some environments in a worker process, carrying out commands sent from a VectorPacManEnv"""
+    envs = [PacManEnv(**env_kwargs) for _ in range(env_count)]
+    while True:
+        command, data = conn.recv()
+        if command == 'reset':
+            conn.send([env.reset(seed) for env, seed in zip(envs, data)])
+        elif command == 'step':
+            results = []
+            for env, action in zip(envs, data):
+                obs, reward, terminated, truncated, info = env.step(action)
+                if terminated or truncated:     # start the next episode straight away, keeping the last observation
+                    info['final_observation'] = obs
+                    obs, _ = env.reset()
+                results.append((obs, reward, terminated, truncated, info))
+            conn.send(results)
+        elif command == 'close':
+            conn.close()
+            break
+
+
+class VectorPacManEnv:
+    """Steps a number of independent games together in a pool of worker processes, one per CPU core by default,
+    returning batched observations and rewards. Finished games are reset automatically, with their last
+    observation kept in the info dict as 'final_observation'"""
+
+    def __init__(self, env_count, seed=None, processes=None, **env_kwargs):
+        if np is None:
+            raise ImportError('The PacMan environments require NumPy')
+        self.env_count = env_count
+        self.seed = seed
+        processes = min(env_count, processes or multiprocessing.cpu_count())
+        counts = [env_count // processes + (n < env_count % processes) for n in range(processes)]
+        context = multiprocessing.get_context('spawn')  # no pygame state is shared with the parent process
+        self.connections = []
+        self.workers = []
+        self.slices = []    # range of environment indexes hosted by each worker
+        first = 0
+        for count in counts:
+            parent_conn, child_conn = context.Pipe()
+            worker = context.Process(target=run_worker, args=(child_conn, count, env_kwargs), daemon=True)
+            worker.start()
+            child_conn.close()
+            self.connections.append(parent_conn)
+            self.workers.append(worker)
+            self.slices.append(slice(first, first + count))
+            first += count
+
+    def reset(self, seed=None):
+        """Reset every game, returning the batched observations and a list of info dicts.
+        Given a seed, each game gets its own seed counting up from it"""
+        seed = self.seed if seed is None else seed
+        seeds = [None if seed is None else seed + n for n in range(self.env_count)]
+        for conn, part in zip(self.connections, self.slices):
+            conn.send(('reset', seeds[part]))
+        results = [result for conn in self.connections for result in conn.recv()]
+        observations, infos = zip(*results)
+        return np.stack(observations), list(infos)
+
+    def step(self, actions):
+        """Step every game with its action, sending all the actions out before waiting on any results.
+        Returns batched observations, rewards, terminated and truncated flags, and a list of info dicts"""
+        for conn, part in zip(self.connections, self.slices):
+            conn.send(('step', list(actions[part])))
+        results = [result for conn in self.connections for result in conn.recv()]
+        observations, rewards, terminated, truncated, infos = zip(*results)
+        return (np.stack(observations), np.array(rewards, dtype=np.float32), np.array(terminated),
+                np.array(truncated), list(infos))
+
+    def close(self):
+        """Shut down the worker processes"""
+        for conn in self.connections:
+            try:
+                conn.send(('close', None))
+                conn.close()
+            except (BrokenPipeError, OSError) as e:
+                print(e)
+        for worker in self.workers:
+            worker.join()
+        self.connections = []
+        self.workers = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
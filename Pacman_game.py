@@ -1,13 +1,23 @@
+import argparse
 import pygame
+import random
+import time
 from Event_loop import EventLoop
 from Ghost import Ghost
-from Maze import Maze
+from Ghost_strategy import GhostStrategy, AmbushStrategy, FlankStrategy, ShyStrategy
+from Ghost_engine import GhostEngine
+from Maze import Maze, FlowField
 from Pacman import PacMan
 from Lives_status import PacManCounter
 from Score import ScoreController, LevelTransition
-from Sound_manager import SoundManager
+from Sound_manager import SoundManager, sound_bank
 from Menu import Menu, HighScoreScreen
 from Intro import Intro
+from Game_clock import game_clock
+from Asset_loader import AssetLoader
+from Frame_profiler import FrameProfiler
+from Observation import MazeObservation
+from Replay import Replay, ReplayRecorder
 
 
 class PacManPortalGame:
@@ -18,74 +28,121 @@ class PacManPortalGame:
     START_EVENT = pygame.USEREVENT + 1
     REBUILD_EVENT = pygame.USEREVENT + 2
     LEVEL_TRANSITION_EVENT = pygame.USEREVENT + 3
+    PROFILER_KEY = pygame.K_F3  # toggles the frame profiler overlay
+    LOGIC_RATE = 60     # logic updates per second, fixed since PacMan and ghost speeds are pixels per update
+    # chase strategy of each ghost, and its home corner as (bottom, right)
+    GHOST_STRATEGIES = {'ghost-red.png': (GhostStrategy, (0, 1)), 'ghost-pink.png': (AmbushStrategy, (0, 0)),
+                        'ghost-lblue.png': (FlankStrategy, (1, 1)), 'ghost-orange.png': (ShyStrategy, (1, 0))}
 
-    def __init__(self):
-        pygame.init()
-        pygame.mixer.music.load('sounds/bg-music.wav')
-        self.screen = pygame.display.set_mode(
-            (800, 600)
-        )
-        pygame.display.set_caption('PacMan Portal')
+    def __init__(self, headless=False, seed=None, render_rate=60, ghost_engine=False, record=False):
+        self.assets = AssetLoader()     # times startup, and loads gameplay assets in the background
+        self.headless = headless    # simulate the game world only, with no window, audio or real time
+        self.tick_ms = 1000 / PacManPortalGame.LOGIC_RATE  # game time covered by each logic update
+        self.tick_count = 0     # logic updates run so far this session
+        self.render_rate = render_rate  # frames drawn per second during play, 0 for no limit
+        self.max_frame_ms = 250     # longest real time a single frame may catch up on
+        self.previous_positions = {}    # sprite positions before the last logic update, for interpolation
+        if headless:
+            pygame.font.init()  # some game objects still render text, but no window or mixer is opened
+            self.screen = pygame.Surface((800, 600))
+            game_clock.use_step_time()
+        else:
+            pygame.init()
+            pygame.mixer.music.load('Sounds/bg-music.wav')
+            self.screen = pygame.display.set_mode(
+                (800, 600)
+            )
+            pygame.display.set_caption('PacMan Portal')
+            game_clock.use_system_time()
+        self.seed = seed if seed is not None else random.randrange(1 << 32)     # kept so a session can be replayed
+        self.rng = random.Random(self.seed)     # drives all in-game randomness, so a seed makes a game repeatable
         self.clock = pygame.time.Clock()
+        self.profiler = FrameProfiler(self.screen)
         self.score_keeper = ScoreController(screen=self.screen,
                                             sb_pos=((self.screen.get_width() // 5),
                                                     (self.screen.get_height() * 0.965)),
                                             items_image='cherry.png',
                                             itc_pos=(int(self.screen.get_width() * 0.6),
                                                      self.screen.get_height() * 0.965))
-        self.maze = Maze(screen=self.screen, maze_map_file='maze_map.txt')
+        self.use_ghost_engine = ghost_engine
+        self.recorder = ReplayRecorder(self) if record else None   # records the input of each game played
+        self.game_over = True
+        self.pause = False
+        self.maze = None    # the game world is built by load_gameplay, after the menu is first shown
+        self.actions = {PacManPortalGame.START_EVENT: self.init_ghosts,
+                        PacManPortalGame.REBUILD_EVENT: self.rebuild_maze,
+                        PacManPortalGame.LEVEL_TRANSITION_EVENT: self.next_level}
+        if headless:
+            self.load_gameplay()
+        else:
+            self.assets.start()
+
+    def load_gameplay(self):
+        """Build the maze, PacMan and the ghosts, waiting for the background asset loading to finish first"""
+        waited = self.assets.wait()
+        self.maze = Maze(screen=self.screen, maze_map_file='maze_map.txt', rng=self.rng)
         self.life_counter = PacManCounter(screen=self.screen, ct_pos=((self.screen.get_width() // 3),
                                                                       (self.screen.get_height() * 0.965)),
                                           images_size=(self.maze.block_size, self.maze.block_size))
         self.level_transition = LevelTransition(screen=self.screen, score_controller=self.score_keeper)
-        self.game_over = True
-        self.pause = False
         self.player = PacMan(screen=self.screen, maze=self.maze)
         self.ghosts = pygame.sprite.Group()
+        self.chase_field = FlowField(self.maze)     # distances to PacMan, shared by all ghosts
+        # optionally move all ghosts together in one vectorized update, which needs NumPy
+        self.ghost_engine = GhostEngine(self.maze, self.chase_field) if self.use_ghost_engine else None
         self.ghost_sound_manager = SoundManager(sound_files=['ghost-blue.wav', 'pacman_eatghost.wav', 'ghost-std.wav'],
                                                 keys=['blue', 'eaten', 'std'],
-                                                channel=Ghost.GHOST_AUDIO_CHANNEL)
+                                                priority=SoundManager.PRIORITY_LOW)
         self.ghost_active_interval = 2500
         self.ghosts_to_activate = None
         self.first_ghost = None
         self.other_ghosts = []
         self.spawn_ghosts()
-        self.actions = {PacManPortalGame.START_EVENT: self.init_ghosts,
-                        PacManPortalGame.REBUILD_EVENT: self.rebuild_maze,
-                        PacManPortalGame.LEVEL_TRANSITION_EVENT: self.next_level}
+        self.observation = None     # observation grids, only kept up to date once asked for
+        if not self.headless:
+            print('Game ready after %d ms (waited %d ms for assets)' %
+                  (self.assets.elapsed_ms(time.perf_counter()), waited))
 
     def init_ghosts(self):
         """kick start the ghost AI over a period of time"""
         if not self.first_ghost.state['enabled']:
             self.first_ghost.enable()
             self.ghosts_to_activate = self.other_ghosts.copy()
-            pygame.time.set_timer(PacManPortalGame.START_EVENT, 0)  # disable timer repeat
-            pygame.time.set_timer(PacManPortalGame.START_EVENT, self.ghost_active_interval)
+            game_clock.set_timer(PacManPortalGame.START_EVENT, 0)  # disable timer repeat
+            game_clock.set_timer(PacManPortalGame.START_EVENT, self.ghost_active_interval)
         else:
             try:
                 g = self.ghosts_to_activate.pop()
                 g.enable()
             except IndexError:
-                pygame.time.set_timer(PacManPortalGame.START_EVENT, 0)  # disable timer repeat
+                game_clock.set_timer(PacManPortalGame.START_EVENT, 0)  # disable timer repeat
 
     def spawn_ghosts(self):
         """Create all ghosts at their starting positions"""
         files = ['ghost-pink.png', 'ghost-lblue.png', 'ghost-orange.png', 'ghost-red.png']
         idx = 0
+        spawned = []
         while len(self.maze.ghost_spawn) > 0:
             spawn_info = self.maze.ghost_spawn.pop()
             g = Ghost(screen=self.screen, maze=self.maze, target=self.player,
-                      spawn_info=spawn_info, ghost_file=files[idx], sound_manager=self.ghost_sound_manager)
+                      spawn_info=spawn_info, ghost_file=files[idx], sound_manager=self.ghost_sound_manager,
+                      chase_field=self.chase_field, engine=self.ghost_engine)
             if files[idx] == 'ghost-red.png':
                 self.first_ghost = g    # red ghost should be first
             else:
                 self.other_ghosts.append(g)
             self.ghosts.add(g)
+            spawned.append((g, files[idx]))
             idx = (idx + 1) % len(files)
+        bottom, right = len(self.maze.layout.tiles) - 1, len(self.maze.layout.tiles[0]) - 1
+        for g, ghost_file in spawned:   # once all are spawned, as the blue ghost works off the red one
+            strategy, (at_bottom, at_right) = PacManPortalGame.GHOST_STRATEGIES[ghost_file]
+            g.strategy = strategy(self.maze, self.player, corner=(at_bottom * bottom, at_right * right),
+                                  partner=self.first_ghost)
 
     def next_level(self):
         """Increment the game level and then continue the game"""
-        pygame.time.set_timer(PacManPortalGame.LEVEL_TRANSITION_EVENT, 0)  # reset timer
+        game_clock.set_timer(PacManPortalGame.LEVEL_TRANSITION_EVENT, 0)  # reset timer
         self.player.clear_portals()
         self.score_keeper.increment_level()
         self.rebuild_maze()
@@ -107,12 +164,13 @@ class PacManPortalGame:
             self.level_transition.set_show_transition()
         else:
             self.game_over = True
-        pygame.time.set_timer(PacManPortalGame.REBUILD_EVENT, 0)    # disable timer repeat
+        game_clock.set_timer(PacManPortalGame.REBUILD_EVENT, 0)    # disable timer repeat
 
     def check_player(self):
         """Check the player to see if they have been hit by an enemy, or if they have consumed pellets/fruit"""
         n_score, n_fruits, power = self.player.eat()
-        self.score_keeper.add_score(score=n_score, items=n_fruits if n_fruits > 0 else None)
+        if n_score or n_fruits:
+            self.score_keeper.add_score(score=n_score, items=n_fruits if n_fruits > 0 else None)
         if power:
             for g in self.ghosts:
                 g.begin_blue_state()
@@ -127,41 +185,96 @@ class PacManPortalGame:
             for g in self.ghosts:
                 if g.state['enabled']:   # disable any ghosts
                     g.disable()
-            pygame.time.set_timer(PacManPortalGame.START_EVENT, 0)  # cancel start event
-            pygame.time.set_timer(PacManPortalGame.REBUILD_EVENT, 4000)
+            game_clock.set_timer(PacManPortalGame.START_EVENT, 0)  # cancel start event
+            game_clock.set_timer(PacManPortalGame.REBUILD_EVENT, 4000)
         elif not self.maze.pellets_left() and not self.pause:
-            pygame.mixer.stop()
+            sound_bank.stop_all()
             self.pause = True
-            pygame.time.set_timer(PacManPortalGame.LEVEL_TRANSITION_EVENT, 1000)
+            game_clock.set_timer(PacManPortalGame.LEVEL_TRANSITION_EVENT, 1000)
 
-    def update_screen(self):
-        """Update the game screen"""
+    def update_world(self):
+        """Advance the game logic by one update, without drawing anything"""
         if not self.level_transition.transition_show:
-            self.screen.fill(PacManPortalGame.BLACK_BG)
-            self.check_player()
-            self.maze.blit()
+            with self.profiler.stage('check_player'):
+                self.check_player()
             if not self.pause:
-                self.ghosts.update()
-                self.player.update()
-                self.maze.teleport.check_teleport(self.player.rect)     # teleport player/projectiles
+                with self.profiler.stage('ghosts.update'):
+                    # ghosts may only go through the tunnel's teleporters from level 4 on
+                    self.maze.navigation.set_teleports(self.score_keeper.level > 3)
+                    self.chase_field.update(self.player.tile)   # only searches when PacMan changes tiles
+                    if self.ghost_engine:
+                        self.ghost_engine.update()  # moves and animates every ghost together
+                    else:
+                        self.ghosts.update()
+                with self.profiler.stage('player.update'):
+                    self.player.update()
+                with self.profiler.stage('teleport'):
+                    self.maze.teleport.check_teleport(self.player.rect)     # teleport player/projectiles
             for g in self.ghosts:
-                if self.score_keeper.level > 3:
-                    if not g.state['speed_boost']:
-                        g.increase_speed()
-                    self.maze.teleport.check_teleport(g.rect)   # teleport ghosts
-                g.blit()
-            self.player.blit()
-            self.score_keeper.blit()
-            self.life_counter.blit()
+                if self.score_keeper.level > 3 and not g.state['speed_boost']:
+                    g.increase_speed()
         elif self.player.dead:
             self.player.update()
-            self.player.blit()
         else:
-            self.level_transition.draw()
+            self.level_transition.update()
             # if transition just finished, init ghosts
             if not self.level_transition.transition_show:
                 self.init_ghosts()
-        pygame.display.flip()
+
+    def interpolate(self, sprite, alpha):
+        """Return the position of a sprite the given fraction of the way from its previous to its current position"""
+        old_x, old_y = self.previous_positions.get(sprite, sprite.rect.topleft)
+        new_x, new_y = sprite.rect.topleft
+        if abs(new_x - old_x) + abs(new_y - old_y) > self.maze.block_size:
+            return new_x, new_y     # teleported or reset, so don't slide across the screen
+        return round(old_x + (new_x - old_x) * alpha), round(old_y + (new_y - old_y) * alpha)
+
+    def draw(self, alpha=1.0):
+        """Draw the current state of the game to the screen, alpha of the way between the last two logic updates"""
+        if not self.level_transition.transition_show:
+            with self.profiler.stage('maze.blit'):
+                self.maze.blit()    # maze background layer covers the whole screen
+            with self.profiler.stage('ghosts.blit'):
+                # one batched call, so a crowd of ghosts costs little more than its blits
+                self.screen.blits([(g.image, self.interpolate(g, alpha)) for g in self.ghosts], False)
+            with self.profiler.stage('player.blit'):
+                self.player.blit(self.interpolate(self.player, alpha))
+            with self.profiler.stage('hud.blit'):
+                self.score_keeper.blit()
+                self.life_counter.blit()
+        elif self.player.dead:
+            self.player.blit()
+        else:
+            self.level_transition.draw()
+        self.profiler.blit()
+
+    def logic_step(self):
+        """Advance game time by one fixed tick, handle any game timers which came due, and update the game logic"""
+        if not self.headless:
+            self.previous_positions = {s: s.rect.topleft for s in (self.player, *self.ghosts)}
+        for event_type in game_clock.advance(self.tick_ms):
+            self.actions[event_type]()
+        self.update_world()
+        if self.observation:
+            self.observation.update_actors()
+        self.tick_count += 1
+
+    def get_observation(self):
+        """Return a read-only view of the maze observation grids, which are kept up to date from then on.
+        The view changes as the game runs, so copy it to keep a snapshot"""
+        if self.observation is None:
+            self.observation = MazeObservation(self.maze, self.player, self.ghosts)
+        self.observation.update_actors()
+        return self.observation.view
+
+    def step(self, events=()):
+        """Advance a headless game by one tick of game time without drawing.
+        Input events are handled first, as if they came from the event queue"""
+        for event in events:
+            if event.type in self.player.event_map:
+                self.player.event_map[event.type](event)
+        self.logic_step()
+        sound_bank.flush()
 
     def run(self):
         """Run the game application, starting from the menu"""
@@ -171,7 +284,7 @@ class PacManPortalGame:
         e_loop = EventLoop(loop_running=True, actions={pygame.MOUSEBUTTONDOWN: menu.check_buttons})
 
         while e_loop.loop_running:
-            self.clock.tick(60)  # 60 fps limit
+            self.clock.tick(self.render_rate or 60)  # menu frame rate limit
             e_loop.check_events()
             self.screen.fill(PacManPortalGame.BLACK_BG)
             if not menu.hs_screen:
@@ -194,12 +307,16 @@ class PacManPortalGame:
             elif not pygame.mixer.music.get_busy():
                 pygame.mixer.music.play(-1)     # music loop
             pygame.display.flip()
+            self.assets.mark_first_frame()
+            if self.maze is None and self.assets.is_ready():
+                self.load_gameplay()    # assets are in, so build the game world between menu frames
 
-    def play_game(self):
-        """Run the game's event loop, using an EventLoop object"""
-        e_loop = EventLoop(loop_running=True, actions={**self.player.event_map, **self.actions})
+    def start_game(self):
+        """Set up a new game, beginning with the level transition"""
         # game init signal
-        # pygame.time.set_timer(PacManPortalGame.START_EVENT, self.level_transition.transition_time)
+        # game_clock.set_timer(PacManPortalGame.START_EVENT, self.level_transition.transition_time)
+        if self.maze is None:
+            self.load_gameplay()    # ready barrier, if the game world isn't built yet
         self.level_transition.set_show_transition()
         self.game_over = False
         if self.player.dead:
@@ -208,16 +325,97 @@ class PacManPortalGame:
             self.life_counter.reset_counter()
             self.rebuild_maze()
 
+    def end_game(self):
+        """Clean up after a game has finished"""
+        sound_bank.stop_all()
+        if self.recorder:
+            print('Replay saved to ' + self.recorder.end_game(self.score_keeper.score))
+        self.score_keeper.reset_level()
+        path = self.profiler.export_csv()   # only written if the profiler was used
+        if path:
+            print('Frame profile saved to ' + path)
+
+    def check_keydown(self, event):
+        """Toggle the frame profiler, or pass the key on to PacMan"""
+        if event.key == PacManPortalGame.PROFILER_KEY:
+            self.profiler.toggle()
+        else:
+            self.player.perform_action(event)
+
+    def play_game(self):
+        """Run the game's event loop, using an EventLoop object. Game logic runs at a fixed rate on step time,
+        catching up with real time as needed, while frames are drawn at the render rate"""
+        e_loop = EventLoop(loop_running=True, actions={**self.player.event_map, **self.actions,
+                                                       pygame.KEYDOWN: self.check_keydown}, recorder=self.recorder)
+        game_clock.use_step_time(start=pygame.time.get_ticks())
+        self.start_game()
+        if self.recorder:
+            self.recorder.start_game(game_clock.get_ticks())
+        accumulator = 0
+        last_frame = pygame.time.get_ticks()
+
         while e_loop.loop_running:
-            self.clock.tick(60)  # 60 fps limit
+            self.clock.tick(self.render_rate)
+            now = pygame.time.get_ticks()
+            accumulator += min(now - last_frame, self.max_frame_ms)
+            last_frame = now
+            self.profiler.begin_frame()
             e_loop.check_events()
-            self.update_screen()
+            while accumulator >= self.tick_ms and not self.game_over:
+                self.logic_step()
+                accumulator -= self.tick_ms
+            sound_bank.flush()  # start the sounds triggered this frame
+            self.draw(alpha=accumulator / self.tick_ms)
+            with self.profiler.stage('display.flip'):
+                pygame.display.flip()
+            self.profiler.end_frame()
             if self.game_over:
-                pygame.mixer.stop()
-                self.score_keeper.reset_level()
+                self.end_game()
                 e_loop.loop_running = False
+        game_clock.use_system_time()
+
+    def play_replay(self, replay):
+        """Play back a recorded session as fast as possible, on a headless game created with the replay's seed
+        and settings. Returns the (recorded, replayed) final score of each game, which match unless playback
+        has drifted from the recording"""
+        if replay.logic_rate != PacManPortalGame.LOGIC_RATE:
+            raise ValueError('replay was recorded at %d logic updates per second, the game runs at %d' %
+                             (replay.logic_rate, PacManPortalGame.LOGIC_RATE))
+        results = []
+        for tick, kind, value in replay.records:
+            while self.tick_count < tick:
+                self.logic_step()
+            if kind == Replay.KEY_DOWN or kind == Replay.KEY_UP:
+                event = pygame.event.Event(pygame.KEYDOWN if kind == Replay.KEY_DOWN else pygame.KEYUP, key=value)
+                self.player.event_map[event.type](event)
+            elif kind == Replay.GAME_START:
+                game_clock.use_step_time(start=value)
+                self.start_game()
+            elif kind == Replay.GAME_END:
+                results.append((value, self.score_keeper.score))
+                self.end_game()
+                for g in self.ghosts:
+                    g.reset_speed()     # as the menu does after each game
+        return results
 
 
 if __name__ == '__main__':
-    game = PacManPortalGame()
-    game.run()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Play PacMan Portal')
+    parser.add_argument('--seed', type=int, help='seed for the game\'s randomness')
+    parser.add_argument('--record', action='store_true', help='save a replay of each game to the replays folder')
+    parser.add_argument('--replay', help='play back a replay file headless, as fast as possible')
+    args = parser.parse_args()
+    if args.replay:
+        session = Replay.load(args.replay)
+        game = PacManPortalGame(headless=True, seed=session.seed, ghost_engine=session.ghost_engine)
+        start = time.perf_counter()
+        scores = game.play_replay(session)
+        elapsed = time.perf_counter() - start
+        print('Replayed %d games, %d ticks in %.2f s (%d ticks/s)' %
+              (len(scores), game.tick_count, elapsed, game.tick_count / max(elapsed, 1e-9)))
+        for n, (recorded, replayed) in enumerate(scores, 1):
+            print('Game %d: recorded score %d, replayed score %d%s' %
+                  (n, recorded, replayed, '' if recorded == replayed else ' (MISMATCH)'))
+    else:
+        game = PacManPortalGame(seed=args.seed, record=args.record)
+        game.run()
\ No newline at end of file
@@ -1,5 +1,5 @@
 import pygame
-from Maze import Block
+from Maze import Block, Maze
 from Image_manager import ImageManager
 from Sound_manager import SoundManager
 
@@ -59,7 +59,8 @@ class Portal(Block):
 
 
 class PortalProjectile(pygame.sprite.Sprite):
-    """A projectile which is used to create portals at a distance from a source"""
+    """A projectile which is used to create portals at a distance from a source.
+    Where it lands is worked out when it is fired, so in flight it is only for show"""
     def __init__(self, screen, source, direction, p_type=Portal.P_TYPE_1, size=(5, 5), speed=10):
         super().__init__()
         self.screen = screen
@@ -67,6 +68,7 @@ class PortalProjectile(pygame.sprite.Sprite):
         self.direction = direction
         self.speed = speed
         self.p_type = p_type
+        self.impact = None  # rect of the wall or portal tile the projectile will land on, if any
         self.image = pygame.Surface(size)
         if p_type == Portal.P_TYPE_1:
             self.image.fill(Portal.TYPE_1_COLOR)
@@ -111,14 +113,13 @@ class PortalProjectile(pygame.sprite.Sprite):
 
 class PortalController:
     """Manages portals and their related functionality within the game"""
-    PORTAL_AUDIO_CHANNEL = 3
 
     def __init__(self, screen, user, maze):
         self.screen = screen
         self.maze = maze
         self.user = user
         self.sound_manager = SoundManager(sound_files=['portal-open.wav', 'portal-travel.wav'], keys=['open', 'travel'],
-                                          channel=PortalController.PORTAL_AUDIO_CHANNEL)
+                                          priority=SoundManager.PRIORITY_NORMAL)
         self.blue_portal = pygame.sprite.GroupSingle()  # portals as GroupSingle, which only allows one per group
         self.blue_projectile = None
         self.orange_portal = pygame.sprite.GroupSingle()
@@ -128,42 +129,86 @@ class PortalController:
 
     def clear_portals(self):
         """Remove all portals and projectiles"""
+        for portal in (self.blue_portal, self.orange_portal):
+            if portal:
+                self.restore_block(portal.sprite.rect.x, portal.sprite.rect.y)
         self.blue_portal.empty()
         self.orange_portal.empty()
         self.blue_projectile = None
         self.orange_projectile = None
+        self.link_portals()
+
+    def link_portals(self):
+        """Tell the maze's navigation graph about the current pair of portals, or that there isn't one"""
+        ends = [(self.maze.tile_from_pos(portal.sprite.rect.x, portal.sprite.rect.y), portal.sprite.direction)
+                for portal in (self.blue_portal, self.orange_portal) if portal]
+        self.maze.navigation.set_portals(*ends)     # only linked once both exist
 
     def fire_b_portal_projectile(self):
         """Create a projectile for generating a blue portal"""
         if self.user.direction is not None:
             self.blue_projectile = PortalProjectile(screen=self.screen, source=self.user, direction=self.user.direction,
                                                     p_type=Portal.P_TYPE_1)
+            self.aim_projectile(self.blue_projectile)
 
     def fire_o_portal_projectile(self):
         """Create a projectile for generating an orange portal"""
         if self.user.direction is not None:
             self.orange_projectile = PortalProjectile(screen=self.screen, source=self.user,
                                                       direction=self.user.direction, p_type=Portal.P_TYPE_2)
+            self.aim_projectile(self.orange_projectile)
+
+    def aim_projectile(self, projectile):
+        """Find the first wall or portal tile in a projectile's path by stepping through the tile grid from where
+        it was fired, one tile at a time, checking every tile across its width. It lands on nothing if it leaves
+        the maze first"""
+        maze = self.maze
+        d_row, d_col = Maze.DIRECTION_OFFSETS[projectile.direction]
+        rect = projectile.rect
+        top, left = maze.tile_from_pos(rect.left, rect.top)
+        bottom, right = maze.tile_from_pos(rect.right - 1, rect.bottom - 1)
+        if d_row:   # leading row or column of tiles the projectile covers
+            lead = [(bottom if d_row > 0 else top, col) for col in range(left, right + 1)]
+        else:
+            lead = [(row, right if d_col > 0 else left) for row in range(top, bottom + 1)]
+        rows = len(maze.tile_grid)
+        while any(0 <= row < rows and 0 <= col < len(maze.tile_grid[row]) for row, col in lead):
+            for row, col in lead:
+                if maze.get_tile(row, col) & (Maze.TILE_WALL | Maze.TILE_PORTAL):
+                    projectile.impact = pygame.Rect(maze.get_tile_pos(row, col), (maze.block_size, maze.block_size))
+                    return
+            lead = [(row + d_row, col + d_col) for row, col in lead]
+
+    def land_projectile(self, projectile):
+        """Return the occupancy flags of the tile a projectile has reached the end of its flight at, or None while
+        it is still flying. The tile is checked again on landing, as a portal may have opened or closed there"""
+        if projectile.impact and projectile.rect.colliderect(projectile.impact):
+            return self.maze.get_tile(*self.maze.tile_from_pos(projectile.impact.x, projectile.impact.y))
+        return None
+
+    def restore_block(self, x, y):
+        """Put a normal maze block back in the location a portal took up"""
+        tile = self.maze.tile_from_pos(x, y)
+        self.maze.maze_blocks.add(self.maze.wall_blocks[tile])
+        self.maze.set_tile(*tile, self.maze.TILE_WALL)
 
     def create_blue_portal(self, x, y, direction):
         """Create a blue portal, replacing the location it originally took up with a normal maze block"""
         if self.blue_portal:
-            old_x, old_y = self.blue_portal.sprite.rect.x, self.blue_portal.sprite.rect.y
-            self.maze.maze_blocks.add(
-                Block(old_x, old_y, self.maze.block_size, self.maze.block_size, self.maze.block_image)
-            )
+            self.restore_block(self.blue_portal.sprite.rect.x, self.blue_portal.sprite.rect.y)
+        self.maze.set_tile(*self.maze.tile_from_pos(x, y), self.maze.TILE_PORTAL)
         self.blue_portal.add(Portal(screen=self.screen, x=x, y=y, direction=direction,
                                     maze=self.maze, p_type=Portal.P_TYPE_1))
+        self.link_portals()
 
     def create_orange_portal(self, x, y, direction):
         """Create a blue portal, replacing the location it originally took up with a normal maze block"""
         if self.orange_portal:
-            old_x, old_y = self.orange_portal.sprite.rect.x, self.orange_portal.sprite.rect.y
-            self.maze.maze_blocks.add(
-                Block(old_x, old_y, self.maze.block_size, self.maze.block_size, self.maze.block_image)
-            )
+            self.restore_block(self.orange_portal.sprite.rect.x, self.orange_portal.sprite.rect.y)
+        self.maze.set_tile(*self.maze.tile_from_pos(x, y), self.maze.TILE_PORTAL)
         self.orange_portal.add(Portal(screen=self.screen, x=x, y=y, direction=direction,
                                       maze=self.maze, p_type=Portal.P_TYPE_2))
+        self.link_portals()
 
     def update(self):
         """Update the portal controller's display parts and tracking"""
@@ -171,15 +216,14 @@ class PortalController:
         self.orange_portal.update()
         if self.blue_projectile:
             self.blue_projectile.update()   # update projectile
+            landed = self.land_projectile(self.blue_projectile)
             # erase projectile if it hits a portal
-            if pygame.sprite.spritecollideany(self.blue_projectile, self.blue_portal) or \
-                    pygame.sprite.spritecollideany(self.blue_projectile, self.orange_portal):
+            if landed is not None and landed & Maze.TILE_PORTAL:
                 self.blue_projectile = None
                 return
-            collision = pygame.sprite.spritecollideany(self.blue_projectile, self.maze.maze_blocks)
-            if collision:   # if projectile hits a block, replace it with a blue portal
-                x, y = collision.rect.x, collision.rect.y
-                collision.kill()    # Replace the block with a portal
+            if landed is not None and landed & Maze.TILE_WALL:  # if projectile hits a block, replace it with a portal
+                x, y = self.blue_projectile.impact.topleft
+                self.maze.wall_blocks[self.maze.tile_from_pos(x, y)].kill()     # Replace the block with a portal
                 direction = self.portal_directions[self.blue_projectile.direction]
                 self.blue_projectile = None     # remove the projectile
                 self.create_blue_portal(x, y, direction)
@@ -189,15 +233,14 @@ class PortalController:
                 self.blue_projectile = None
         if self.orange_projectile:
             self.orange_projectile.update()
+            landed = self.land_projectile(self.orange_projectile)
             # erase projectile if it hits a portal
-            if pygame.sprite.spritecollideany(self.orange_projectile, self.blue_portal) or \
-                    pygame.sprite.spritecollideany(self.orange_projectile, self.orange_portal):
+            if landed is not None and landed & Maze.TILE_PORTAL:
                 self.orange_projectile = None
                 return
-            collision = pygame.sprite.spritecollideany(self.orange_projectile, self.maze.maze_blocks)
-            if collision:   # if projectile hits a block, replace it with an orange portal
-                x, y = collision.rect.x, collision.rect.y
-                collision.kill()  # Replace the block with a portal
+            if landed is not None and landed & Maze.TILE_WALL:  # if projectile hits a block, replace it with a portal
+                x, y = self.orange_projectile.impact.topleft
+                self.maze.wall_blocks[self.maze.tile_from_pos(x, y)].kill()   # Replace the block with a portal
                 direction = self.portal_directions[self.orange_projectile.direction]
                 self.orange_projectile = None   # remove the projectile
                 self.create_orange_portal(x, y, direction)
@@ -209,11 +252,6 @@ class PortalController:
         """Return True if the portables are usable (i.e. there are two of them)"""
         return self.blue_portal and self.orange_portal
 
-    def collide_portals(self, other):
-        """Return True if the sprite is colliding with any portal"""
-        return pygame.sprite.spritecollideany(other, self.blue_portal) or \
-            pygame.sprite.spritecollideany(other, self.orange_portal)
-
     def check_portals(self, *args):
         """Check if other sprites have come into contact with the portals, and if so move them"""
         for arg in args:
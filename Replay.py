@@ -0,0 +1,124 @@
+import os
+import pygame
+import time
+
+
+class Replay:
+    """A recorded session: the seed driving the game's randomness, the logic settings, and every input event
+    with the logic tick it arrived before. Saved compactly, with each record's tick stored as the number of ticks
+    since the previous record and all numbers stored as variable length integers"""
+    MAGIC = b'PMRP'
+    VERSION = 1
+    # record kinds
+    KEY_DOWN = 0
+    KEY_UP = 1
+    GAME_START = 2  # value is the game clock's start time
+    GAME_END = 3    # value is the final score, for checking the playback against
+
+    def __init__(self, seed, logic_rate=60, ghost_engine=False):
+        self.seed = seed
+        self.logic_rate = logic_rate
+        self.ghost_engine = ghost_engine
+        self.records = []   # (tick, kind, value), in order
+
+    def add(self, tick, kind, value):
+        """Add a record at the given logic tick"""
+        self.records.append((tick, kind, value))
+
+    @staticmethod
+    def write_number(data, number):
+        """Append a non-negative integer to a bytearray, 7 bits per byte with the high bit marking more to come"""
+        while number > 0x7f:
+            data.append((number & 0x7f) | 0x80)
+            number >>= 7
+        data.append(number)
+
+    @staticmethod
+    def read_number(data, pos):
+        """Read a variable length integer from data at pos, returning it and the position after it"""
+        number = shift = 0
+        while True:
+            byte = data[pos]
+            pos += 1
+            number |= (byte & 0x7f) << shift
+            if not byte & 0x80:
+                return number, pos
+            shift += 7
+
+    def encode(self):
+        """Return the replay as bytes"""
+        data = bytearray(Replay.MAGIC)
+        data.append(Replay.VERSION)
+        for number in (self.seed, self.logic_rate, int(self.ghost_engine)):
+            Replay.write_number(data, number)
+        last_tick = 0
+        for tick, kind, value in self.records:
+            Replay.write_number(data, tick - last_tick)     # delta-encoded ticks, mostly one byte each
+            data.append(kind)
+            Replay.write_number(data, value)
+            last_tick = tick
+        return bytes(data)
+
+    @classmethod
+    def decode(cls, data):
+        """Return the replay stored in some bytes"""
+        if data[:len(Replay.MAGIC)] != Replay.MAGIC:
+            raise ValueError('not a replay file')
+        pos = len(Replay.MAGIC)
+        if data[pos] != Replay.VERSION:
+            raise ValueError('unsupported replay version ' + str(data[pos]))
+        pos += 1
+        seed, pos = Replay.read_number(data, pos)
+        logic_rate, pos = Replay.read_number(data, pos)
+        ghost_engine, pos = Replay.read_number(data, pos)
+        replay = cls(seed, logic_rate, bool(ghost_engine))
+        tick = 0
+        while pos < len(data):
+            delta, pos = Replay.read_number(data, pos)
+            kind = data[pos]
+            value, pos = Replay.read_number(data, pos + 1)
+            tick += delta
+            replay.add(tick, kind, value)
+        return replay
+
+    def save(self, path):
+        """Write the replay to a file"""
+        with open(path, 'wb') as file:
+            file.write(self.encode())
+
+    @classmethod
+    def load(cls, path):
+        """Read a replay from a file"""
+        with open(path, 'rb') as file:
+            return cls.decode(file.read())
+
+
+class ReplayRecorder:
+    """Records the input events an event loop dispatches during play, stamped with the game's logic tick,
+    and saves the session as a replay after each game"""
+    INPUT_EVENTS = {pygame.KEYDOWN: Replay.KEY_DOWN, pygame.KEYUP: Replay.KEY_UP}
+
+    def __init__(self, game, export_dir='replays'):
+        self.game = game
+        self.replay = Replay(game.seed, game.LOGIC_RATE, game.use_ghost_engine)
+        self.export_dir = export_dir
+        self.path = None    # chosen when the first game is saved, then rewritten after each later game
+
+    def record(self, event):
+        """Record an input event, ignoring any other kind of event"""
+        kind = ReplayRecorder.INPUT_EVENTS.get(event.type)
+        if kind is not None:
+            self.replay.add(self.game.tick_count, kind, event.key)
+
+    def start_game(self, clock_start):
+        """Record the start of a game, and the game clock time it started at"""
+        self.replay.add(self.game.tick_count, Replay.GAME_START, int(clock_start))
+
+    def end_game(self, score):
+        """Record the end of a game and its final score, then save the session so far"""
+        self.replay.add(self.game.tick_count, Replay.GAME_END, score)
+        if self.path is None:
+            os.makedirs(self.export_dir, exist_ok=True)
+            self.path = os.path.join(self.export_dir, time.strftime('session-%Y%m%d-%H%M%S.pmr'))
+        self.replay.save(self.path)
+        return self.path
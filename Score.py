@@ -1,19 +1,20 @@
 from Sound_manager import SoundManager
+from Game_clock import game_clock
+from Text_cache import text_cache
 import json
 import pygame
 
 
 class LevelTransition:
     """Displays a level transition"""
-    TRANSITION_CHANNEL = 4
 
     def __init__(self, screen, score_controller, transition_time=5000):
         self.screen = screen
         self.score_controller = score_controller
         self.sound = SoundManager(['pacman_beginning.wav'], keys=['transition'],
-                                  channel=LevelTransition.TRANSITION_CHANNEL, volume=0.6)
-        self.font = pygame.font.SysFont(None, 32)
-        self.ready_msg = self.font.render('Get Ready!', True, ScoreBoard.SCORE_WHITE)
+                                  priority=SoundManager.PRIORITY_HIGH, volume=0.6)
+        self.font = text_cache.get_font(None, 32)
+        self.ready_msg = text_cache.render(self.font, 'Get Ready!', ScoreBoard.SCORE_WHITE)
         self.ready_msg_rect = self.ready_msg.get_rect()
         ready_pos = screen.get_width() // 2, int(screen.get_height() * 0.65)
         self.ready_msg_rect.centerx, self.ready_msg_rect.centery = ready_pos
@@ -26,7 +27,7 @@ class LevelTransition:
     def prep_level_msg(self):
         """Prepare a message for the current level number"""
         text = 'level ' + str(self.score_controller.level)
-        self.level_msg = self.font.render(text, True, ScoreBoard.SCORE_WHITE)
+        self.level_msg = text_cache.render(self.font, text, ScoreBoard.SCORE_WHITE)
         self.level_msg_rect = self.level_msg.get_rect()
         level_pos = self.screen.get_width() // 2, self.screen.get_height() // 2
         self.level_msg_rect.centerx, self.level_msg_rect.centery = level_pos
@@ -34,19 +35,21 @@ class LevelTransition:
     def set_show_transition(self):
         """Begin the sequence for displaying the transition"""
         self.prep_level_msg()
-        self.transition_begin = pygame.time.get_ticks()
+        self.transition_begin = game_clock.get_ticks()
         self.transition_show = True
         self.sound.play('transition')
 
+    def update(self):
+        """End the transition once its time is up"""
+        if abs(self.transition_begin - game_clock.get_ticks()) > self.transition_time:
+            self.transition_show = False
+
     def draw(self):
         """Display the level transition to the screen"""
-        if abs(self.transition_begin - pygame.time.get_ticks()) > self.transition_time:
-            self.transition_show = False
-        else:
-            self.screen.fill((0, 0, 0))
-            self.screen.blit(self.level_msg, self.level_msg_rect)
-            if abs(self.transition_begin - pygame.time.get_ticks()) >= self.transition_time // 2:
-                self.screen.blit(self.ready_msg, self.ready_msg_rect)
+        self.screen.fill((0, 0, 0))
+        self.screen.blit(self.level_msg, self.level_msg_rect)
+        if abs(self.transition_begin - game_clock.get_ticks()) >= self.transition_time // 2:
+            self.screen.blit(self.ready_msg, self.ready_msg_rect)
 
 
 class ScoreBoard:
@@ -58,7 +61,7 @@ class ScoreBoard:
         self.screen = screen
         self.score = 0
         self.color = ScoreBoard.SCORE_WHITE
-        self.font = pygame.font.SysFont(None, 36)
+        self.font = text_cache.get_font(None, 36)
         self.image = None
         self.rect = None
         self.prep_image()
@@ -72,7 +75,7 @@ class ScoreBoard:
     def prep_image(self):
         """Render the score to a font image"""
         score_str = str(self.score)
-        self.image = self.font.render(score_str, True, self.color)
+        self.image = text_cache.render(self.font, score_str, self.color)
         self.rect = self.image.get_rect()
 
     def update(self, n_score):
@@ -97,9 +100,9 @@ class ItemCounter:
     def __init__(self, screen, image_name, pos=(0, 0)):
         self.screen = screen
         self.counter = 0
-        self.item_image = pygame.image.load('images/' + image_name)
+        self.item_image = pygame.image.load('Images/' + image_name)
         self.item_rect = self.item_image.get_rect()
-        self.font = pygame.font.SysFont(None, 36)
+        self.font = text_cache.get_font(None, 36)
         self.color = ScoreBoard.SCORE_WHITE
         self.text_image = None
         self.text_rect = None
@@ -119,7 +122,7 @@ class ItemCounter:
     def prep_image(self):
         """Render the counter's image for future display"""
         text = str(self.counter) + ' X '
-        self.text_image = self.font.render(text, True, self.color)
+        self.text_image = text_cache.render(self.font, text, self.color)
         self.text_rect = self.text_image.get_rect()
         self.position()
 
@@ -157,7 +160,8 @@ class ScoreController:
 
     def add_score(self, score, items=None):
         """Add new score and prepare for scoreboard display"""
-        self.scoreboard.update(score)
+        if score:
+            self.scoreboard.update(score)
         self.score = self.scoreboard.score
         if items:
             self.item_counter.add_items(items)
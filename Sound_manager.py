@@ -1,31 +1,136 @@
 import pygame
+import threading
+
+
+class SoundBank:
+    """Sounds decoded once for the whole process, played through a shared pool of mixer channels.
+    Play requests are queued and handed out once per frame: repeated triggers from the same owner are coalesced,
+    higher priority sounds go first, and when every channel is busy the lowest priority, oldest voice is stolen"""
+    def __init__(self, channel_count=8):
+        self.sounds = {}    # file name -> Sound
+        self.lock = threading.Lock()    # the asset loader fills the bank from a background thread
+        self.channel_count = channel_count
+        self.channels = None    # channel pool, opened on first use once the mixer is running
+        self.voices = {}    # channel index -> [owner, sound, priority, loops, start order]
+        self.pending = {}   # owner -> (sound, loops, priority, volume) of its latest request this frame
+        self.started = 0    # count of voices started, used to find the oldest voice
+        self.coalesced = 0  # requests merged into another request or into a sound already playing
+        self.stolen = 0     # voices cut off to make room for a higher priority sound
+        self.dropped = 0    # requests with no channel to play on
+
+    def load(self, s_file):
+        """Return the sound for a file, loading it the first time it is asked for"""
+        with self.lock:
+            sound = self.sounds.get(s_file)
+        if sound is None:
+            sound = pygame.mixer.Sound('Sounds/' + s_file)
+            with self.lock:
+                sound = self.sounds.setdefault(s_file, sound)
+        return sound
+
+    def get_channels(self):
+        """Return the pooled channels, reserving them from the mixer the first time"""
+        if self.channels is None:
+            if pygame.mixer.get_num_channels() < self.channel_count:
+                pygame.mixer.set_num_channels(self.channel_count)
+            self.channels = [pygame.mixer.Channel(i) for i in range(self.channel_count)]
+        return self.channels
+
+    def request(self, owner, sound, loops=0, priority=0, volume=None):
+        """Queue a sound for the owner to play at the next flush, replacing any earlier request of the owner's"""
+        if not pygame.mixer.get_init():
+            return  # no audio (e.g. headless simulation)
+        if owner in self.pending:
+            self.coalesced += 1
+        self.pending[owner] = (sound, loops, priority, volume)
+
+    def stop(self, owner):
+        """Stop the owner's sound and forget any request it has queued"""
+        self.pending.pop(owner, None)
+        for i, voice in list(self.voices.items()):
+            if voice[0] is owner:
+                self.channels[i].stop()
+                del self.voices[i]
+
+    def stop_all(self):
+        """Stop every sound, and forget all queued requests"""
+        self.pending.clear()
+        self.voices.clear()
+        if pygame.mixer.get_init():
+            pygame.mixer.stop()
+
+    def flush(self):
+        """Play the requests queued since the last flush, highest priority first. Call once per frame"""
+        if not self.pending:
+            return
+        channels = self.get_channels()
+        for i in [i for i in self.voices if not channels[i].get_busy()]:
+            del self.voices[i]  # finished playing
+        requests = sorted(self.pending.items(), key=lambda r: -r[1][2])
+        self.pending.clear()
+        for owner, (sound, loops, priority, volume) in requests:
+            self.play(owner, sound, loops, priority, volume)
+
+    def play(self, owner, sound, loops, priority, volume):
+        """Start a sound for the owner, on its own channel if it has one, or else a free or stolen channel"""
+        index = next((i for i, voice in self.voices.items() if voice[0] is owner), None)
+        if index is not None and self.voices[index][1] is sound and (loops == 0) == (self.voices[index][3] == 0):
+            self.coalesced += 1     # already playing this sound, so let it carry on rather than restart it
+            return
+        if index is None:
+            index = next((i for i in range(len(self.channels)) if i not in self.voices), None)
+        if index is None:
+            victim = min(self.voices.items(), key=lambda v: (v[1][2], v[1][4]))  # lowest priority, then oldest
+            if victim[1][2] > priority:
+                self.dropped += 1
+                return
+            index = victim[0]
+            self.stolen += 1
+        channel = self.channels[index]
+        channel.set_volume(1.0 if volume is None else volume)
+        channel.play(sound, loops=loops)
+        self.voices[index] = [owner, sound, priority, loops, self.started]
+        self.started += 1
+
+
+sound_bank = SoundBank()    # bank shared by all sound managers
 
 
 class SoundManager:
-    """Handles the playing of sound over pygame mixer"""
-    def __init__(self, sound_files, keys=None, channel=0, volume=None):
+    """Handles the playing of a set of sounds through the shared sound bank, staying silent if the mixer
+    is not initialized. Each manager plays one sound at a time, so a new sound replaces its last one"""
+    PRIORITY_LOW = 0
+    PRIORITY_NORMAL = 1
+    PRIORITY_HIGH = 2
+
+    def __init__(self, sound_files, keys=None, priority=PRIORITY_NORMAL, volume=None):
         self.sound_files = sound_files
         self.sounds = {}
-        self.channel = pygame.mixer.Channel(channel)
+        self.priority = priority
+        self.volume = volume
+        if not pygame.mixer.get_init():
+            return  # no audio (e.g. headless simulation), so skip loading sounds
         if not keys:
             for s_file in sound_files:
-                self.sounds[s_file] = pygame.mixer.Sound('Sounds/' + s_file)
+                self.sounds[s_file] = sound_bank.load(s_file)
         else:
             if len(keys) != len(sound_files):
                 raise ValueError('number of keys must be the same as the number of sound files')
             for key, s_file in zip(keys, sound_files):
-                self.sounds[key] = pygame.mixer.Sound('Sounds/' + s_file)
-        if isinstance(volume, float):
-            self.channel.set_volume(volume)
+                self.sounds[key] = sound_bank.load(s_file)
 
-    def play(self, key):
+    def play(self, key, priority=None):
         """Play a sound once"""
-        self.channel.play(self.sounds[key], loops=0)
+        if self.sounds:
+            sound_bank.request(self, self.sounds[key], loops=0,
+                               priority=self.priority if priority is None else priority, volume=self.volume)
 
-    def play_loop(self, key):
+    def play_loop(self, key, priority=None):
         """Loop a sound indefinitely"""
-        self.channel.play(self.sounds[key], loops=-1)
+        if self.sounds:
+            sound_bank.request(self, self.sounds[key], loops=-1,
+                               priority=self.priority if priority is None else priority, volume=self.volume)
 
     def stop(self):
         """Stop sound from playing"""
-        self.channel.stop()
\ No newline at end of file
+        sound_bank.stop(self)
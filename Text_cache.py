@@ -0,0 +1,42 @@
+import pygame
+from collections import OrderedDict
+
+
+class TextCache:
+    """Least recently used store of rendered text, shared by the HUD, menus and title cards,
+    so that text is only rendered again when its string, font or color actually changes"""
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.fonts = {}     # (name, size) -> font, there are only a handful so they are never evicted
+        self.entries = OrderedDict()    # (font, text, color, antialias) -> surface, least recently used first
+        self.hits = 0
+        self.misses = 0
+
+    def get_font(self, name, size):
+        """Return a shared system font, loading it the first time it is asked for"""
+        key = (name, size)
+        if key not in self.fonts:
+            self.fonts[key] = pygame.font.SysFont(name, size)
+        return self.fonts[key]
+
+    def render(self, font, text, color, antialias=True):
+        """Return the text rendered in the given font and color, rendering it only if it is not cached.
+        The surface returned is shared, so it should never be drawn onto"""
+        key = (font, text, tuple(color), antialias)
+        image = self.entries.get(key)
+        if image is None:
+            self.misses += 1
+            image = self.entries[key] = font.render(text, antialias, color)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)    # evict the least recently used text
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return image
+
+    def clear(self):
+        """Forget all rendered text"""
+        self.entries.clear()
+
+
+text_cache = TextCache()    # cache shared by all text displays
@@ -0,0 +1,204 @@
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')   # run without a window or sound card
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import argparse
+import json
+import random
+import timeit
+import pygame
+from Game_clock import game_clock
+from Ghost import Ghost
+from Image_manager import ImageManager, surface_cache
+from Maze import Maze
+from Sound_manager import sound_bank
+try:
+    import numpy as np
+except ImportError:     # only needed to benchmark the ghost engine, which needs it too
+    np = None
+from Pacman_game import PacManPortalGame
+
+
+class BenchmarkSuite:
+    """Times the game's hot paths on SDL's dummy drivers, and compares the results against stored baselines"""
+
+    BASELINE_FILE = 'benchmark_baseline.json'
+    GHOST_OFFSETS = [(0, 0, 32, 32), (0, 32, 32, 32)]
+    WARMUP_TICKS = 300  # logic updates run before timing ghost direction choices
+
+    def __init__(self, ghosts=4, ghost_engine=False, repeat=5, seed=0):
+        self.repeat = repeat
+        self.rng = random.Random(seed)
+        self.game = PacManPortalGame(seed=seed, ghost_engine=ghost_engine)
+        game_clock.use_step_time()  # game time only moves with the benchmarked frames
+        self.game.start_game()
+        self.maze = self.game.maze
+        self.player = self.game.player
+        self.ghost_count = ghosts
+        self.ghost_engine = ghost_engine
+        self.add_ghosts(ghosts - len(self.game.ghosts))
+        walkable = self.maze.layout.walkable
+        self.tile_pairs = [(tuple(self.rng.choice(walkable)), tuple(self.rng.choice(walkable))) for _ in range(200)]
+        self.results = {}
+
+    def add_ghosts(self, count):
+        """Add extra ghosts to the game, sharing the spawn points of the normal four"""
+        spawns = self.maze.layout.ghost_spawns
+        for n in range(count):
+            self.game.ghosts.add(Ghost(screen=self.game.screen, maze=self.maze, target=self.player,
+                                       spawn_info=spawns[n % len(spawns)], sound_manager=self.game.ghost_sound_manager,
+                                       chase_field=self.game.chase_field, engine=self.game.ghost_engine))
+
+    def keep_playing(self):
+        """Put the game back into normal play with every ghost chasing, if the last frame ended it"""
+        game = self.game
+        if game.player.dead or game.pause or game.level_transition.transition_show or game.game_over:
+            if game.game_over or game.life_counter.lives <= 0:
+                game.life_counter.reset_counter()
+                game.game_over = False
+            game.rebuild_maze()
+            game.pause = False
+            game.level_transition.transition_show = False
+        for g in game.ghosts:
+            if not g.state['enabled']:
+                g.enable()
+
+    def time(self, name, func):
+        """Time a function, recording its best time per call in microseconds"""
+        timer = timeit.Timer(func)
+        number, _ = timer.autorange()
+        best = min(timer.repeat(repeat=self.repeat, number=number)) / number
+        self.results[name] = best * 1e6
+
+    def bench_build_maze(self):
+        self.time('maze.build_maze', self.maze.build_maze)
+
+    def bench_find_path(self):
+        def find_paths():
+            for start, target in self.tile_pairs:
+                self.maze.find_path(start, target)
+        self.time('maze.find_path x%d' % len(self.tile_pairs), find_paths)
+
+    def bench_is_blocked(self):
+        self.player.reset_position()
+        self.player.set_move_left()
+        self.time('pacman.is_blocked', self.player.is_blocked)
+
+    def bench_eat(self):
+        row, col = self.player.tile
+
+        def eat():
+            self.maze.pellet_grid[row][col] = Maze.PELLET    # put the pellet back, so every call eats one
+            self.maze.pellet_count += 1
+            self.player.eat()
+        self.time('pacman.eat', eat)
+
+    def bench_portal_update(self):
+        controller = self.player.portal_controller
+        self.player.reset_position()
+        self.player.set_move_left()
+
+        def fire_and_land():
+            controller.fire_b_portal_projectile()
+            controller.fire_o_portal_projectile()
+            for _ in range(100):
+                controller.update()
+                if not (controller.blue_projectile or controller.orange_projectile):
+                    break
+            controller.clear_portals()
+        self.time('portal_controller.update (fire and land)', fire_and_land)
+
+    def bench_images(self):
+        sheet = surface_cache.load_file('ghost-red.png')
+        self.time('image_manager.extract_images', lambda: ImageManager.extract_images(sheet, self.GHOST_OFFSETS))
+
+        def load(cold):
+            if cold:
+                surface_cache.clear()
+            ImageManager('ghost-red.png', sheet=True, pos_offsets=self.GHOST_OFFSETS,
+                         resize=(self.maze.block_size, self.maze.block_size), animation_delay=250)
+        self.time('image_manager load (cold cache)', lambda: load(True))
+        self.time('image_manager load (warm cache)', lambda: load(False))
+
+    def bench_frame(self):
+        def logic_step():
+            self.keep_playing()
+            self.game.logic_step()
+            sound_bank.flush()
+        setting = '(%d ghosts%s)' % (self.ghost_count, ', engine' if self.ghost_engine else '')
+        self.time('logic_step ' + setting, logic_step)
+        self.time('draw ' + setting, lambda: self.game.draw(alpha=0.5))
+
+    def bench_choose_directions(self):
+        for _ in range(self.WARMUP_TICKS):  # let the ghosts spread out over the maze
+            self.keep_playing()
+            self.game.logic_step()
+        self.keep_playing()
+        ghosts = [g for g in self.game.ghosts if g.state['enabled'] and not g.state['return']]
+        engine = self.game.ghost_engine
+        if engine:
+            slots = np.array([g.slot for g in ghosts], dtype=np.int64)
+            rows, cols = engine.row[slots], engine.col[slots]
+            self.time('ghost_engine.choose_directions x%d' % len(ghosts),
+                      lambda: engine.choose_directions(slots, rows, cols))
+            return
+
+        def choose_directions():
+            for g in ghosts:
+                g.route = ''    # decide afresh from each ghost's tile, rather than follow a committed route
+                g.get_corridor_direction(away=g.state['blue'])
+        self.time('ghost.get_corridor_direction x%d' % len(ghosts), choose_directions)
+        for g in ghosts:
+            g.route = ''
+
+    def run(self):
+        """Run every benchmark"""
+        for bench in (self.bench_build_maze, self.bench_find_path, self.bench_is_blocked, self.bench_eat,
+                      self.bench_portal_update, self.bench_images, self.bench_frame, self.bench_choose_directions):
+            bench()
+        return self.results
+
+    @staticmethod
+    def load_baselines():
+        """Read the stored baseline results, if there are any"""
+        try:
+            with open(BenchmarkSuite.BASELINE_FILE, 'r') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}   # nothing saved yet
+        except ValueError as e:
+            print(e)
+            return {}
+
+    def save_baselines(self):
+        """Store the results as baselines, keeping baselines of benchmarks which were not run"""
+        baselines = self.load_baselines()
+        baselines.update(self.results)
+        with open(BenchmarkSuite.BASELINE_FILE, 'w') as file:
+            json.dump(baselines, file, indent=2, sort_keys=True)
+
+    def report(self, baselines):
+        """Print the results beside their baselines"""
+        print('%-42s %12s %12s %8s' % ('benchmark', 'us/call', 'baseline', 'change'))
+        for name, result in self.results.items():
+            if name in baselines:
+                change = (result - baselines[name]) / baselines[name] * 100
+                print('%-42s %12.2f %12.2f %+7.1f%%' % (name, result, baselines[name], change))
+            else:
+                print('%-42s %12.2f %12s %8s' % (name, result, '-', '-'))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the game's hot paths against stored baselines")
+    parser.add_argument('--ghosts', type=int, default=4, help='number of ghosts in the full frame benchmark')
+    parser.add_argument('--ghost-engine', action='store_true', help='move ghosts with the NumPy ghost engine')
+    parser.add_argument('--repeat', type=int, default=5, help='timing runs per benchmark, the best is kept')
+    parser.add_argument('--save', action='store_true', help='store these results as the new baselines')
+    args = parser.parse_args()
+    suite = BenchmarkSuite(ghosts=args.ghosts, ghost_engine=args.ghost_engine, repeat=args.repeat)
+    suite.run()
+    suite.report(suite.load_baselines())
+    if args.save:
+        suite.save_baselines()
+        print('Baselines saved to ' + BenchmarkSuite.BASELINE_FILE)
+    pygame.quit()